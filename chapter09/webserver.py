@@ -2,6 +2,7 @@
 >>> uv run webserver.py 20123
 """
 
+import sys
 import socket
 import logging
 import argparse
@@ -45,22 +46,7 @@ HTTPProtocol: TypeAlias = str
 # HTTPHeader: TypeAlias = str
 # HTTPProtocol: TypeAlias = str
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger('webclient')
-
-parser = argparse.ArgumentParser(
-    description='Creates a simple web server in python using the socket library.'
-)
-parser.add_argument('port', nargs='?', default=DEFAULT_SERVER_PORT, type=int)
-args = parser.parse_args()
-logger.info(args)
-
-s: socket.socket = socket.socket()
-s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-
-s.bind(('', args.port))  # Binds to "any local address"
-s.listen()
-logger.info(f'Created new server socket listening at {args.port=}')
+logger = logging.getLogger('webserver')
 
 
 def parse_request_header(
@@ -148,27 +134,56 @@ def serve_file(sock: socket.socket, path: Path) -> None:
         logger.error(f'Error serving file: {e}')
 
 
-# Accept new connections
-try:
-    while True:
-        new_conn = s.accept()
-        new_socket = new_conn[0]
-        client_ip, client_port = new_conn[1]
-        logger.debug(
-            f'New connection received from {client_ip=} on {client_port=}'
-        )
-        try:
-            new_request = receive_request(new_socket)
-            method, path, protocol = parse_request_header(new_request)
-            serve_file(new_socket, path)
-            logger.debug(f'{method=} {path=} {protocol=}')
-        except Exception as e:
-            logger.exception(e)
-        finally:
-            new_socket.close()
-            logger.debug(f'Closed socket {new_socket=} {id(new_socket)=}')
-except (KeyboardInterrupt, EOFError):
-    logger.info('Server shutdown requested')
-finally:
-    s.close()
-    logger.debug(f'Closed socket {s=} {id(s)=}')
+def serve(port: int = DEFAULT_SERVER_PORT) -> None:
+    s: socket.socket = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+    s.bind(('', port))  # Binds to "any local address"
+    s.listen()
+    logger.info(f'Created new server socket listening at {port=}')
+
+    # Accept new connections
+    try:
+        while True:
+            new_conn = s.accept()
+            new_socket = new_conn[0]
+            client_ip, client_port = new_conn[1]
+            logger.debug(
+                f'New connection received from {client_ip=} on {client_port=}'
+            )
+            try:
+                new_request = receive_request(new_socket)
+                method, path, protocol = parse_request_header(new_request)
+                serve_file(new_socket, path)
+                logger.debug(f'{method=} {path=} {protocol=}')
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                new_socket.close()
+                logger.debug(f'Closed socket {new_socket=} {id(new_socket)=}')
+    except (KeyboardInterrupt, EOFError):
+        logger.info('Server shutdown requested')
+    finally:
+        s.close()
+        logger.debug(f'Closed socket {s=} {id(s)=}')
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Creates a simple web server in python using the socket library.'
+    )
+    parser.add_argument(
+        'port', nargs='?', default=DEFAULT_SERVER_PORT, type=int
+    )
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.DEBUG)
+    logger.info(args)
+
+    serve(args.port)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
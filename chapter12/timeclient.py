@@ -4,6 +4,7 @@ NIST time    : 3954235334
 System time  : 3954235334
 """
 
+import sys
 import time
 import socket
 import logging
@@ -14,7 +15,6 @@ TIME_PROTOCOL_PORT = 37
 RESPONSE_BUFFER_SIZE = 4
 EPOCHS_DELTA = 2_208_988_800  # Seconds between 1900-01-01 and 1970-01-01
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger('timeclient')
 
 def system_seconds_since_1900() -> int:
@@ -30,10 +30,17 @@ def get_nist_time() -> int:
         
         return int.from_bytes(response, byteorder='big')
 
-try:
-    nist_time = get_nist_time()
-    system_time = system_seconds_since_1900()
-    print(f'NIST time    : {nist_time}')
-    print(f'System time  : {system_time}')
-except Exception as e:
-    logger.exception(e)
+def main(argv=None):
+    logging.basicConfig(level=logging.DEBUG)
+
+    try:
+        nist_time = get_nist_time()
+        system_time = system_seconds_since_1900()
+        print(f'NIST time    : {nist_time}')
+        print(f'System time  : {system_time}')
+    except Exception as e:
+        logger.exception(e)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
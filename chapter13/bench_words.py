@@ -0,0 +1,121 @@
+"""
+$ python -m chapter13.bench_words --words 200000 --runs 3
+
+Small-message throughput of the word protocol over loopback: TCP (one
+length-prefixed stream, as wordserver.py sends by default) against UDP
+(words packed into datagrams, wordserver.py --udp). The server side runs in
+a thread; the words are picked before the clock starts.
+
+Both clients parse the same way: words are framed with a running offset
+into what was received, not by re-slicing a buffer, so the comparison is
+between transports rather than between parsers.
+"""
+
+import sys
+import time
+import random
+import socket
+import argparse
+import threading
+
+from chapter13.wordserver import WORDS, pack_word, send_word_datagrams
+from chapter13.wordclient import (
+    UDP_RECEIVE_BUFFER_SIZE,
+    WORD_BYTE_LENGTH,
+    DatagramStats,
+    get_udp_words,
+)
+
+RECV_BUFFER_SIZE = 1 << 16
+
+
+def tcp_run(word_list: list[str]) -> tuple[int, float]:
+    """Send the words over TCP; returns (words received, seconds)."""
+
+    payload = b''.join(map(pack_word, word_list))
+    listener = socket.create_server(('127.0.0.1', 0))
+
+    def server():
+        new_s, _ = listener.accept()
+        new_s.sendall(payload)
+        new_s.close()
+
+    thread = threading.Thread(target=server)
+    thread.start()
+
+    start = time.perf_counter()
+    s = socket.create_connection(listener.getsockname())
+    buffer = bytearray()
+    offset = 0
+    words = 0
+    while chunk := s.recv(RECV_BUFFER_SIZE):
+        buffer += chunk
+        while len(buffer) - offset >= WORD_BYTE_LENGTH:
+            end = (
+                offset
+                + WORD_BYTE_LENGTH
+                + int.from_bytes(
+                    buffer[offset : offset + WORD_BYTE_LENGTH], byteorder='big'
+                )
+            )
+            if end > len(buffer):
+                break
+            buffer[offset + WORD_BYTE_LENGTH : end].decode()
+            words += 1
+            offset = end
+        del buffer[:offset]
+        offset = 0
+    elapsed = time.perf_counter() - start
+
+    s.close()
+    thread.join()
+    listener.close()
+    return words, elapsed
+
+
+def udp_run(word_list: list[str]) -> DatagramStats:
+    """Send the words over UDP; returns the client's DatagramStats."""
+
+    server_s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server_s.bind(('127.0.0.1', 0))
+
+    def server():
+        _, address = server_s.recvfrom(RECV_BUFFER_SIZE)
+        send_word_datagrams(server_s, address, word_list)
+
+    thread = threading.Thread(target=server)
+    thread.start()
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER_SIZE)
+    stats = DatagramStats()
+    for _ in get_udp_words(s, server_s.getsockname(), len(word_list), stats):
+        pass
+
+    s.close()
+    thread.join()
+    server_s.close()
+    return stats
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument('--words', type=int, default=200_000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv[1:])
+
+    rng = random.Random(args.seed)
+    word_list = [rng.choice(WORDS) for _ in range(args.words)]
+
+    for run in range(args.runs):
+        words, elapsed = tcp_run(word_list)
+        print(
+            f'tcp run {run}: {words} words in {elapsed * 1000:.1f} ms:'
+            f' {words / elapsed:,.0f} words/s'
+        )
+        print(f'udp run {run}: {udp_run(word_list)}')
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,15 +1,18 @@
 """
 $ uv run wordclient.py localhost 4041
+$ uv run wordclient.py --udp localhost 4041 100000
 
 ---
 Concepts: pipes, packets, stream buffers, stacks, iterators, generators, encoding packet schemas at the type-level
 """
 
 import sys
+import time
 import socket
+import struct
 import logging
 
-from typing import TypeAlias, Optional
+from typing import Iterator, TypeAlias, Optional
 
 # Word packet structure
 WORD_BYTE_LENGTH = 2
@@ -20,11 +23,26 @@ RESPONSE_BUFFER_SIZE = 10
 packet_buffer: bytearray = bytearray()
 WordPacket: TypeAlias = tuple[int, str]
 
-logging.basicConfig(level=logging.DEBUG)
+# UDP mode: see wordserver.py for the datagram layout
+UDP_REQUEST = struct.Struct('!I')
+UDP_HEADER = struct.Struct('!IH')
+MAX_DATAGRAM_SIZE = 1472
+
+# Seconds of silence before giving up: the server may take a while to pick
+# a big batch of words, then the datagrams should arrive back to back, and
+# once the end marker is in only stragglers can still be on their way
+UDP_REQUEST_TIMEOUT = 5.0
+UDP_TIMEOUT = 1.0
+UDP_DRAIN_TIMEOUT = 0.1
+
+# Ask for a big socket receive buffer so bursts don't overflow it (the
+# kernel may cap this at net.core.rmem_max)
+UDP_RECEIVE_BUFFER_SIZE = 1 << 22
+
 logger = logging.getLogger('wordclient')
 
 def usage():
-    print("usage: wordclient.py server port", file=sys.stderr)
+    print("usage: wordclient.py [--udp] server port [word_count]", file=sys.stderr)
 
 def get_next_word_packet(s: socket.socket) -> Optional[bytearray]:
     """
@@ -85,16 +103,147 @@ def parse_packet(word_packet: bytearray) -> str:
     return word
     
 
-# Do not modify:
+class DatagramStats:
+    """Counts for one UDP word transfer: what arrived, late, twice, or not at all."""
+
+    def __init__(self):
+        self.datagrams = 0
+        self.words = 0
+        self.bytes = 0
+        self.duplicates = 0
+        self.malformed = 0  # too short, or lengths that don't add up
+        self.reordered = 0  # arrived after a datagram with a later sequence number
+        self.expected: Optional[int] = None  # datagram count, from the end marker
+        self.elapsed = 0.0  # seconds from the first datagram to the last
+        self._highest = -1
+        self._seen: set[int] = set()
+
+    @property
+    def lost(self) -> int:
+        # Without the end marker, assume nothing after the highest one was sent
+        expected = self._highest + 1 if self.expected is None else self.expected
+        return expected - len(self._seen)
+
+    def record(self, sequence: int, size: int) -> bool:
+        """Count a datagram in. False if it's a duplicate, to be ignored."""
+        if sequence in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(sequence)
+        if sequence < self._highest:
+            self.reordered += 1
+        self._highest = max(self._highest, sequence)
+        self.datagrams += 1
+        self.bytes += size
+        return True
+
+    def __str__(self) -> str:
+        elapsed = max(self.elapsed, 1e-9)
+        return (
+            f"{self.words} words in {self.datagrams} datagrams ({self.bytes} bytes)"
+            f" in {self.elapsed * 1000:.1f} ms: {self.words / elapsed:,.0f} words/s,"
+            f" {self.bytes / elapsed / 1e6:.1f} MB/s;"
+            f" {self.lost} lost, {self.reordered} reordered, {self.duplicates} duplicated,"
+            f" {self.malformed} malformed"
+        )
+
+def parse_word_datagram(datagram: bytes) -> tuple[int, int, list[str]]:
+    """
+    Split a word datagram into (sequence number, word count, words). A word
+    count of 0 is the end marker.
+
+    Raises BufferError if the datagram is malformed.
+    """
+
+    if len(datagram) < UDP_HEADER.size:
+        raise BufferError("Word datagram is too short for its header!")
+    sequence, word_count = UDP_HEADER.unpack_from(datagram)
+    words = []
+    offset = UDP_HEADER.size
+    for _ in range(word_count):
+        word_length = int.from_bytes(datagram[offset : offset + WORD_BYTE_LENGTH], byteorder='big')
+        offset += WORD_BYTE_LENGTH
+        if offset + word_length > len(datagram):
+            raise BufferError("Length of word datagram is incorrect!")
+        try:
+            words.append(datagram[offset : offset + word_length].decode(WORD_ENCODING))
+        except UnicodeDecodeError:
+            raise BufferError("Word datagram is not valid UTF-8!")
+        offset += word_length
+
+    if offset != len(datagram):
+        raise BufferError("Length of word datagram is incorrect!")
+    return sequence, word_count, words
+
+def get_udp_words(s: socket.socket, address, word_count: int, stats: DatagramStats) -> Iterator[str]:
+    """
+    Request `word_count` words from the server at `address` and yield them
+    in the order they arrive, until every datagram is in or the server
+    goes quiet. `stats` is filled in along the way.
+    """
+
+    # Connected, so the kernel drops datagrams from anyone but the server
+    s.connect(address)
+    s.settimeout(UDP_REQUEST_TIMEOUT)
+    s.send(UDP_REQUEST.pack(word_count))
+    start = None
+
+    while stats.expected is None or stats.datagrams < stats.expected:
+        try:
+            datagram = s.recv(MAX_DATAGRAM_SIZE)
+        except socket.timeout:
+            break
+        except ConnectionRefusedError:
+            logger.warning(f"Nothing is listening on {address}")
+            break
+        if start is None:
+            start = time.perf_counter()
+            s.settimeout(UDP_TIMEOUT)
+        stats.elapsed = time.perf_counter() - start
+
+        try:
+            sequence, datagram_word_count, words = parse_word_datagram(datagram)
+        except BufferError:
+            stats.malformed += 1
+            continue
+        if datagram_word_count == 0:
+            stats.expected = sequence
+            s.settimeout(UDP_DRAIN_TIMEOUT)
+        elif stats.record(sequence, len(datagram)):
+            stats.words += len(words)
+            yield from words
+
+def udp_main(host: str, port: int, word_count: int) -> None:
+    s: socket.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RECEIVE_BUFFER_SIZE)
+
+    print("Getting words:")
+
+    stats = DatagramStats()
+    for word in get_udp_words(s, (host, port), word_count, stats):
+        print(f"\t{word}")
+
+    s.close()
+    print(stats, file=sys.stderr)
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    logging.basicConfig(level=logging.DEBUG)
+
+    udp = "--udp" in argv[1:]
+    argv = [arg for arg in argv if arg != "--udp"]
 
-def main(argv):
     try:
         host = argv[1]
         port = int(argv[2])
+        word_count = int(argv[3]) if len(argv) > 3 else 0
     except:
         usage()
         return 1
 
+    if udp:
+        return udp_main(host, port, word_count)
+
     s: socket.socket = socket.socket()
     s.connect((host, port))
     logger.info(f"Connected socket {s=} to {host=} on  {port=}")
@@ -1,10 +1,13 @@
 """
 $ uv run wordserver.py 4041
+$ uv run wordserver.py --udp 4041
 """
 
 import sys
+import time
 import socket
 import random
+import struct
 
 # Some common English words
 WORDS: list[str] = [
@@ -37,21 +40,40 @@ WORDS: list[str] = [
 # How many bytes is the word length?
 WORD_LEN_SIZE = 2
 
+# UDP mode: a client asks for words with a request datagram holding the word
+# count it wants (0 for "surprise me"). The words come back packed into as
+# few datagrams as possible, each one:
+#
+#   sequence number (4 bytes) | words in this datagram (2 bytes) | words...
+#
+# with the same length-prefixed words as over TCP. A final datagram with a
+# word count of 0 marks the end, and its sequence number is how many
+# datagrams came before it, so the client can tell how many went missing.
+UDP_REQUEST = struct.Struct('!I')
+UDP_HEADER = struct.Struct('!IH')
+
+# The most words one request gets; bigger requests are cut down to this so
+# a single 4-byte datagram can't make the server build billions of words
+MAX_UDP_WORD_COUNT = 1_000_000
+
+# 1500-byte Ethernet MTU minus the IPv4 (20) and UDP (8) headers: datagrams
+# no bigger than this are never fragmented on the way
+MAX_DATAGRAM_SIZE = 1472
+
 def usage():
-    print("usage: wordserver.py port", file=sys.stderr)
+    print("usage: wordserver.py [--udp] port", file=sys.stderr)
 
-def build_word_packet(word_count: int) -> tuple[bytes, list]:
-    word_packet = b''
-    word_list = []
+def pack_word(word: str) -> bytes:
+    word_bytes = word.encode()
+    word_len = len(word_bytes)
+    word_len_bytes = word_len.to_bytes(WORD_LEN_SIZE, "big")
+    return word_len_bytes + word_bytes
 
-    for _ in range(word_count):
-        word = random.choice(WORDS)
-        word_bytes = word.encode()
-        word_len = len(word_bytes)
-        word_len_bytes = word_len.to_bytes(WORD_LEN_SIZE, "big")
+def build_word_packet(word_count: int) -> tuple[bytes, list]:
+    word_list = [random.choice(WORDS) for _ in range(word_count)]
 
-        word_packet += word_len_bytes + word_bytes
-        word_list.append(word)
+    # One join rather than growing a bytes object word by word
+    word_packet = b''.join(map(pack_word, word_list))
 
     return word_packet, word_list
         
@@ -64,7 +86,85 @@ def send_words(s):
 
     return word_list
 
-def main(argv):
+def pack_word_datagrams(word_list: list[str]) -> list[tuple[int, bytes]]:
+    """
+    Pack words into datagram payloads of at most MAX_DATAGRAM_SIZE bytes
+    (header included), never splitting a word across two.
+
+    Returns (words in the datagram, packed words) for each datagram.
+    """
+
+    room = MAX_DATAGRAM_SIZE - UDP_HEADER.size
+    datagrams = []
+    words: list[bytes] = []
+    size = 0
+
+    for word in word_list:
+        packed = pack_word(word)
+        if len(packed) > room:
+            raise ValueError(f"Word too long for one datagram: {word[:20]}...")
+        if size + len(packed) > room:
+            datagrams.append((len(words), b''.join(words)))
+            words, size = [], 0
+        words.append(packed)
+        size += len(packed)
+
+    if words:
+        datagrams.append((len(words), b''.join(words)))
+    return datagrams
+
+def send_word_datagrams(s: socket.socket, address, word_list: list[str]) -> tuple[int, int]:
+    """
+    Send the words to `address` as a burst of datagrams plus the end marker.
+
+    sendmsg() gathers the header and payload straight from their own
+    buffers, so neither gets copied into a combined datagram first.
+
+    Returns the number of datagrams and bytes sent, end marker included.
+    """
+
+    datagrams = pack_word_datagrams(word_list)
+    byte_count = 0
+
+    for sequence, (word_count, payload) in enumerate(datagrams):
+        byte_count += s.sendmsg([UDP_HEADER.pack(sequence, word_count), payload], [], 0, address)
+
+    byte_count += s.sendmsg([UDP_HEADER.pack(len(datagrams), 0)], [], 0, address)
+    return len(datagrams) + 1, byte_count
+
+def serve_udp(port: int) -> None:
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.bind(('', port))
+
+    while True:
+        print("-----------------------")
+        print("Waiting for requests")
+        print("-----------------------")
+
+        # Read more than a request's worth, so that an oversized datagram
+        # shows up as one instead of being silently cut down to size
+        request, address = s.recvfrom(MAX_DATAGRAM_SIZE)
+        if len(request) != UDP_REQUEST.size:
+            print(f"Ignoring malformed request from {address}")
+            continue
+
+        word_count = UDP_REQUEST.unpack(request)[0] or random.randrange(1, 10)
+        word_count = min(word_count, MAX_UDP_WORD_COUNT)
+        word_list = [random.choice(WORDS) for _ in range(word_count)]
+
+        start = time.perf_counter()
+        datagram_count, byte_count = send_word_datagrams(s, address, word_list)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+
+        print(f"Sent {word_count} words to {address} in {datagram_count} datagrams"
+              f" ({byte_count} bytes) in {elapsed * 1000:.1f} ms:"
+              f" {word_count / elapsed:,.0f} words/s, {byte_count / elapsed / 1e6:.1f} MB/s")
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    udp = "--udp" in argv[1:]
+    argv = [arg for arg in argv if arg != "--udp"]
 
     try:
         port = int(argv[1])
@@ -72,6 +172,9 @@ def main(argv):
         usage()
         return 1
 
+    if udp:
+        return serve_udp(port)
+
     s = socket.socket()
     s.bind(('', port))
     s.listen()
@@ -3,6 +3,7 @@ $ hexdump -C tcp_data/tcp_data_0.dat
 $ python3 validate_tcp_packet.py tcp_data/tcp_addrs_0.txt tcp_data/tcp_data_0.dat
 """
 
+import sys
 import logging
 import argparse
 
@@ -14,7 +15,6 @@ WORD_BIT_MASK = 0xffff
 WORD_BIT_LENGTH = 16
 WORD_BYTE_LENGTH = 2
 
-logging.basicConfig(level=logging.CRITICAL)
 logger = logging.getLogger('validate_tcp')
 
 def parse_address_file(fp: Path) -> tuple[bytes, bytes]:
@@ -41,8 +41,8 @@ def parse_ipv4_address(ip: str) -> bytes:
 def parse_data_file(fp: Path) -> tuple[bytes, int]:
     tcp_packet: bytes = fp.read_bytes()
     tcp_checksum: int = int.from_bytes(tcp_packet[TCP_HEADER_CHECKSUM_SLICE]) #WARNING: do we need to parse?
-    logging.debug(f"{tcp_packet=}")
-    logging.debug(f"{tcp_checksum=}")
+    logger.debug(f"{tcp_packet=}")
+    logger.debug(f"{tcp_checksum=}")
     return tcp_packet, tcp_checksum
 
 def compute_tcp_packet_checksum(
@@ -94,12 +94,15 @@ def compute_tcp_packet_checksum(
         offset += WORD_BYTE_LENGTH
     return (~total) & WORD_BIT_MASK
 
-if __name__ == '__main__':
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
     parser = argparse.ArgumentParser(description='Validate TCP packet data')
     parser.add_argument('address_file', type=Path, help='Path to address file') #WARNING can we parse to arbitrary python objects? is that a security risk?!!
     parser.add_argument('data_file', type=Path, help='Path to data file')
-    args = parser.parse_args()
+    args = parser.parse_args(argv[1:])
 
+    logging.basicConfig(level=logging.CRITICAL)
     logger.info(f"{args=}")
 
     source_ip, dest_ip = parse_address_file(args.address_file)
@@ -111,3 +114,6 @@ if __name__ == '__main__':
     logger.info(f"{tcp_checksum=}")
 
     print("PASS" if test_checksum == tcp_checksum else "FAIL")
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,197 @@
+"""
+Batch host-to-router assignment.
+
+print_ip_routers() calls find_router_for_ip() once per address, which walks
+the whole router table every time. For large address inventories
+assign_routers() compiles the table once into a RouterTable and looks up
+every address against it, optionally spread across a pool of worker
+processes.
+"""
+
+import os
+
+from array import array
+from typing import Iterable, Optional, Union
+
+from chapter19 import netfuncs
+
+# Index used in lookup results for "no router on this subnet"
+NO_ROUTER = -1
+
+# How many addresses each worker process is handed at a time
+ASSIGN_CHUNK_SIZE = 1 << 16
+
+
+class RouterTable:
+    """
+    A router table compiled for bulk lookups.
+
+    Routers are grouped by netmask. Within each group there is a mapping
+    from network number to the router's position in the original table, so
+    looking up an address costs one probe per distinct netmask (rarely more
+    than a handful) rather than one subnet test per router. When several
+    routers match, the one that comes first in the original table wins, just
+    like find_router_for_ip().
+
+    It can be built from a router dictionary or from Router records that
+    have already been through netfuncs.compile_routers().
+    """
+
+    def __init__(
+        self,
+        routers: Union[dict[str, dict[str, str]], Iterable[netfuncs.Router]],
+    ):
+        if isinstance(routers, dict):
+            compiled = netfuncs.compile_routers(routers)
+        else:
+            compiled = list(routers)
+        self.router_ips: list[str] = [router.ip for router in compiled]
+
+        by_mask: dict[int, dict[int, int]] = {}
+        for index, router in enumerate(compiled):
+            by_mask.setdefault(router.mask, {}).setdefault(
+                router.network, index
+            )
+        self.by_mask: list[tuple[int, dict[int, int]]] = list(by_mask.items())
+
+        # How many addresses have been looked up, for profiling
+        self.lookups = 0
+
+        # Sorted (networks, indices) arrays per netmask, for np.searchsorted.
+        # Built by the first lookup big enough to go through NumPy.
+        self.sorted_by_mask: Optional[list] = None
+
+    def lookup_values(self, ip_values) -> array:
+        """
+        Return the index (into `router_ips`) of the router for each 32-bit
+        address value, or NO_ROUTER.
+        """
+
+        self.lookups += len(ip_values)
+
+        np = netfuncs.numpy_for(ip_values)
+        if np is not None:
+            return self._lookup_values_numpy(np, ip_values)
+
+        missing = len(self.router_ips)
+        results = array('l')
+        for ip_value in ip_values:
+            best = missing
+            for mask, networks in self.by_mask:
+                index = networks.get(ip_value & mask, missing)
+                if index < best:
+                    best = index
+            results.append(NO_ROUTER if best == missing else best)
+        return results
+
+    def _lookup_values_numpy(self, np, ip_values) -> array:
+        if self.sorted_by_mask is None:
+            self.sorted_by_mask = []
+            for mask, networks in self.by_mask:
+                sorted_networks = sorted(networks)
+                self.sorted_by_mask.append(
+                    (
+                        mask,
+                        np.array(sorted_networks, dtype=np.uint32),
+                        np.array(
+                            [networks[network] for network in sorted_networks],
+                            dtype=np.int64,
+                        ),
+                    )
+                )
+
+        ip_values = np.asarray(ip_values, dtype=np.uint32)
+        missing = len(self.router_ips)
+        best = np.full(len(ip_values), missing, dtype=np.int64)
+
+        for mask, networks, indices in self.sorted_by_mask:
+            masked = ip_values & np.uint32(mask)
+            positions = np.searchsorted(networks, masked)
+            np.minimum(positions, len(networks) - 1, out=positions)
+            found = networks[positions] == masked
+            np.minimum(
+                best, np.where(found, indices[positions], missing), out=best
+            )
+
+        best[best == missing] = NO_ROUTER
+        return array('l', best.tolist())
+
+    def lookup(self, ip: str) -> Optional[str]:
+        index = self.lookup_values([netfuncs.ipv4_to_value(ip)])[0]
+        return None if index == NO_ROUTER else self.router_ips[index]
+
+
+## -------------------------------------------
+## Worker processes
+## -------------------------------------------
+#
+# The compiled table is handed to each worker exactly once, through the pool
+# initializer, and kept in a module global. Tasks then only carry a chunk of
+# address values in and an array of router indices out.
+
+_worker_table: Optional[RouterTable] = None
+
+
+def _init_worker(table: RouterTable) -> None:
+    global _worker_table
+    _worker_table = table
+
+
+def _lookup_chunk(ip_values: array) -> array:
+    return _worker_table.lookup_values(ip_values)
+
+
+def assign_routers(
+    routers: Union[dict[str, dict[str, str]], RouterTable],
+    ips: Iterable[str],
+    processes: Optional[int] = 0,
+    chunk_size: int = ASSIGN_CHUNK_SIZE,
+) -> dict[Optional[str], list[str]]:
+    """
+    Find the router for every IP in `ips`, grouped by router.
+
+    The IPs are deduplicated and sorted (in the same string order
+    print_ip_routers() uses) before lookup. IPs with no router are grouped
+    under None.
+
+    `routers` may be a router dictionary or an already compiled
+    RouterTable. `processes` is the number of worker processes to use: 0
+    looks everything up in this process, None uses one worker per CPU.
+
+    Example:
+    >>> routers = {"1.2.3.1": {"netmask": "/24"}, "1.2.4.1": {"netmask": "/24"}}
+    >>> assign_routers(routers, ["1.2.4.7", "1.2.3.5", "1.2.5.6", "1.2.3.5"])
+    {'1.2.3.1': ['1.2.3.5'], '1.2.4.1': ['1.2.4.7'], None: ['1.2.5.6']}
+    """
+
+    table = (
+        routers if isinstance(routers, RouterTable) else RouterTable(routers)
+    )
+    unique_ips = sorted(set(ips))
+    ip_values = netfuncs.ipv4s_to_values(unique_ips)
+
+    if processes == 0 or len(unique_ips) <= chunk_size:
+        indices = table.lookup_values(ip_values)
+    else:
+        import multiprocessing
+
+        chunks = [
+            ip_values[start : start + chunk_size]
+            for start in range(0, len(ip_values), chunk_size)
+        ]
+        with multiprocessing.Pool(
+            processes or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(table,),
+        ) as pool:
+            indices = array('l')
+            for chunk_indices in pool.imap(_lookup_chunk, chunks):
+                indices.extend(chunk_indices)
+                # The workers' tables are copies; count their lookups here
+                table.lookups += len(chunk_indices)
+
+    router_host_map: dict[Optional[str], list[str]] = {}
+    for ip, index in zip(unique_ips, indices):
+        router = None if index == NO_ROUTER else table.router_ips[index]
+        router_host_map.setdefault(router, []).append(ip)
+    return router_host_map
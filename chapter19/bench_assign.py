@@ -0,0 +1,107 @@
+"""
+$ python -m chapter19.bench_assign --routers 2000 --ips 200000
+
+Compares three ways of assigning hosts to routers on a synthetic table:
+
+- serial:     find_router_for_ip() once per address (what print_ip_routers did)
+- vectorized: assign_routers() in this process
+- processes:  assign_routers() across a pool of worker processes
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+from chapter19 import netfuncs
+from chapter19.assign import RouterTable, assign_routers
+
+
+def random_routers(count: int, rng: random.Random) -> dict[str, dict[str, str]]:
+    routers = {}
+    while len(routers) < count:
+        slash = rng.randint(16, 28)
+        network = rng.getrandbits(32) & netfuncs.SUBNET_MASKS[slash]
+        routers[netfuncs.value_to_ipv4(network | 1)] = {'netmask': f'/{slash}'}
+    return routers
+
+
+def random_ips(routers: dict, count: int, rng: random.Random) -> list[str]:
+    # Mostly addresses behind a router, with some strays that match nothing
+    router_ips = list(routers)
+    ips = []
+    for _ in range(count):
+        if rng.random() < 0.9:
+            router_value = netfuncs.ipv4_to_value(rng.choice(router_ips))
+            ips.append(
+                netfuncs.value_to_ipv4(router_value ^ rng.getrandbits(4))
+            )
+        else:
+            ips.append(netfuncs.value_to_ipv4(rng.getrandbits(32)))
+    return ips
+
+
+def serial_assign(routers: dict, ips: list[str]) -> dict:
+    router_host_map = {}
+    for ip in sorted(set(ips)):
+        router = netfuncs.find_router_for_ip(routers, ip)
+        router_host_map.setdefault(router, []).append(ip)
+    return router_host_map
+
+
+def timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f'{label:>12s}: {elapsed:8.3f}s')
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--routers', type=int, default=2000)
+    parser.add_argument('--ips', type=int, default=200_000)
+    parser.add_argument(
+        '--serial-ips',
+        type=int,
+        default=5_000,
+        help='the serial run is O(routers) per IP, so it gets a sample',
+    )
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv[1:])
+
+    rng = random.Random(args.seed)
+    routers = random_routers(args.routers, rng)
+    ips = random_ips(routers, args.ips, rng)
+    sample = ips[: args.serial_ips]
+
+    print(
+        f'{args.routers} routers, {args.ips} IPs ({args.serial_ips} for serial), '
+        f'NumPy {"on" if netfuncs.get_numpy() is not None else "off"}'
+    )
+
+    expected = timed('serial', serial_assign, routers, sample)
+    if assign_routers(routers, sample) != expected:
+        print(
+            'vectorized result differs from find_router_for_ip()!',
+            file=sys.stderr,
+        )
+        return 1
+
+    table = timed('compile', RouterTable, routers)
+    vectorized = timed('vectorized', assign_routers, table, ips, processes=0)
+    parallel = timed(
+        'processes', assign_routers, table, ips, processes=args.processes
+    )
+    if parallel != vectorized:
+        print(
+            'multi-process result differs from in-process result!',
+            file=sys.stderr,
+        )
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
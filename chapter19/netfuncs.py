@@ -1,9 +1,41 @@
-import sys
-import json
-
-from typing import Optional
+"""
+$ python -m chapter19.netfuncs chapter19/tests/example1.json
+$ python -m chapter19.netfuncs --profile chapter19/tests/example1.json
 
+--profile writes per-stage timings and counters as JSON lines to stderr;
+see chapter19.profiling for the other options.
+"""
 
+import sys
+import socket
+import operator
+import functools
+
+from array import array
+from types import ModuleType
+from typing import (
+    TYPE_CHECKING,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Sized,
+    Union,
+)
+
+if TYPE_CHECKING:
+    import numpy
+
+# Upper bound on the number of distinct strings each parsing cache remembers
+PARSE_CACHE_SIZE = 1 << 16
+
+# Every possible subnet mask, indexed by its slash length: SUBNET_MASKS[24] == 0xffffff00
+SUBNET_MASKS: tuple[int, ...] = tuple(
+    ((1 << slash) - 1) << (32 - slash) for slash in range(33)
+)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def ipv4_to_value(ipv4_addr: str) -> int:
     """
     Convert a dots-and-numbers string IP address to a single 32-bit numeric
@@ -55,6 +87,7 @@ def value_to_ipv4(addr: int) -> str:
     return addr
 
 
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
 def get_subnet_mask_value(slash: str) -> int:
     """
     Given a subnet mask in slash notation, return the value of the mask
@@ -72,12 +105,13 @@ def get_subnet_mask_value(slash: str) -> int:
     0xfffffe00 # == 0b11111111111111111111111000000000 == 4294966784
     """
 
-    # First we produce a run of 1's of length `slash`,
-    # then we shift everything by the remaining digit-count to pad out 32 bits! - this is precisely the bitwise mask!
-    slash: str = int(slash.split('/')[1])
-    slash: int = ((1 << slash) - 1) << (32 - slash)
+    # A run of 1's of length `slash`, shifted by the remaining digit-count to pad out
+    # 32 bits, is precisely the bitwise mask! All 33 of them are precomputed in SUBNET_MASKS.
+    slash: int = int(slash.split('/')[1])
+    if not 0 <= slash <= 32:
+        raise ValueError(f'Subnet mask must be between /0 and /32, got /{slash}')
 
-    return slash
+    return SUBNET_MASKS[slash]
 
 
 def ips_same_subnet(ip1: str, ip2: str, slash: str) -> bool:
@@ -178,19 +212,311 @@ def find_router_for_ip(
     return None
 
 
+## -------------------------------------------
+## Pre-parsed routers
+## -------------------------------------------
+#
+# ipv4_to_value() and get_subnet_mask_value() are memoised above, so a router
+# table that is searched over and over is only parsed once. Going one step
+# further, compile_routers() turns the table into Router records holding plain
+# integers, so lookups against it never touch strings at all.
+
+
+class Router(NamedTuple):
+    ip: str
+    network: int
+    mask: int
+
+
+def compile_routers(routers: dict[str, dict[str, str]]) -> list[Router]:
+    """
+    Parse a dictionary of routers (keyed by router IP) into a list of Router
+    records with integer network and mask fields. The dictionary's order is
+    kept, so searches return the same router as find_router_for_ip().
+
+    Example:
+    >>> compile_routers({"1.2.3.1": {"netmask": "/24"}})
+    [Router(ip='1.2.3.1', network=16909056, mask=4294967040)]
+    """
+
+    compiled = []
+    for router_ip, router_info in routers.items():
+        mask = get_subnet_mask_value(router_info['netmask'])
+        network = get_network(ipv4_to_value(router_ip), mask)
+        compiled.append(Router(router_ip, network, mask))
+    return compiled
+
+
+def find_compiled_router(
+    compiled_routers: Sequence[Router], ip: Union[str, int]
+) -> Optional[str]:
+    """
+    Same as find_router_for_ip(), but searches the output of
+    compile_routers(). `ip` may be a dots-and-numbers string or an already
+    converted 32-bit value.
+
+    Example:
+    >>> compiled = compile_routers({"1.2.3.1": {"netmask": "/24"}})
+    >>> find_compiled_router(compiled, "1.2.3.5")
+    "1.2.3.1"
+    """
+
+    ip_value: int = ipv4_to_value(ip) if isinstance(ip, str) else ip
+
+    for router in compiled_routers:
+        if ip_value & router.mask == router.network:
+            return router.ip
+    return None
+
+
+def cache_stats() -> dict[str, dict[str, float]]:
+    """
+    Report how well the parsing caches are doing, for tuning
+    PARSE_CACHE_SIZE.
+
+    Example:
+    >>> cache_stats()
+    {'ipv4_to_value': {'hits': 90, 'misses': 10, 'maxsize': 65536, 'currsize': 10, 'hit_rate': 0.9}, ...}
+    """
+
+    stats = {}
+    for cached_func in (ipv4_to_value, get_subnet_mask_value):
+        info = cached_func.cache_info()
+        lookups = info.hits + info.misses
+        stats[cached_func.__name__] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'maxsize': info.maxsize,
+            'currsize': info.currsize,
+            'hit_rate': info.hits / lookups if lookups else 0.0,
+        }
+    return stats
+
+
+def clear_caches() -> None:
+    ipv4_to_value.cache_clear()
+    get_subnet_mask_value.cache_clear()
+
+
+## -------------------------------------------
+## Bulk (batch) conversions
+## -------------------------------------------
+#
+# The functions above convert one address per call, which is fine for a
+# handful of routers but far too slow for flow logs with millions of
+# addresses. The batch versions below work on whole sequences at once and
+# return packed uint32 arrays: a NumPy array for big batches when NumPy is
+# installed, and an `array('I')` otherwise. Both index, iterate and `len()`
+# like a list.
+#
+# NumPy is only imported once a batch is big enough to need it. Importing it
+# costs more than a small batch takes to process, and would slow the start
+# of every CLI run that only has a handful of addresses.
+
+# array('I') is 4 bytes on every platform we care about, but be defensive
+UINT32_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+# Batches smaller than this stay on the array module
+NUMPY_MIN_BATCH = 4096
+
+IPv4Values = Union[array, 'numpy.ndarray']
+
+
+@functools.cache
+def get_numpy() -> Optional[ModuleType]:
+    """The numpy module, imported on first call, or None if it isn't installed."""
+    try:
+        import numpy
+    except ImportError:  # fall back to the stdlib array module
+        return None
+    return numpy
+
+
+def numpy_for(values: Union[int, Sized]) -> Optional[ModuleType]:
+    """
+    NumPy, if it's installed and worth using on `values` (or on a batch of
+    that many values): they're a NumPy array already, or there are at least
+    NUMPY_MIN_BATCH of them. None otherwise.
+    """
+
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(values, np.ndarray):
+        return np
+    count = values if isinstance(values, int) else len(values)
+    return get_numpy() if count >= NUMPY_MIN_BATCH else None
+
+
+def _is_value_array(values) -> bool:
+    np = sys.modules.get('numpy')
+    return isinstance(values, array) or (
+        np is not None and isinstance(values, np.ndarray)
+    )
+
+
+_inet_pton4 = functools.partial(socket.inet_pton, socket.AF_INET)
+_inet_ntop4 = functools.partial(socket.inet_ntop, socket.AF_INET)
+
+
+def ipv4s_to_values(ipv4_addrs: Iterable[str]) -> IPv4Values:
+    """
+    Convert many dots-and-numbers IP addresses to a packed array of 32-bit
+    values in one go.
+
+    Instead of splitting and shifting each octet in Python, every address is
+    handed to `socket.inet_pton` (which runs in C) to produce its 4
+    network-order bytes. The bytes are joined into one buffer and
+    reinterpreted as big-endian uint32s.
+
+    inet_pton only takes strict dotted quads. (inet_aton would also take
+    '10.1', '010.0.0.1' as octal, or trailing junk, and disagree with
+    ipv4_to_value() about what they mean.)
+
+    Example:
+    >>> list(ipv4s_to_values(['255.255.0.0', '1.2.3.4']))
+    [4294901760, 16909060]
+    >>> ipv4s_to_values(['10.1'])
+    Traceback (most recent call last):
+    ...
+    OSError: illegal IP address string passed to inet_pton
+    """
+
+    packed: bytes = b''.join(map(_inet_pton4, ipv4_addrs))
+
+    np = numpy_for(len(packed) // 4)
+    if np is not None:
+        return np.frombuffer(packed, dtype='>u4').astype(np.uint32)
+
+    values = array(UINT32_TYPECODE)
+    values.frombytes(packed)
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+def values_to_ipv4s(values: Sequence[int]) -> list[str]:
+    """
+    Convert a sequence of 32-bit values back to dots-and-numbers strings.
+
+    Example:
+    >>> values_to_ipv4s([4294901760, 16909060])
+    ['255.255.0.0', '1.2.3.4']
+    """
+
+    np = numpy_for(values)
+    if np is not None:
+        packed: bytes = np.asarray(values, dtype=np.uint32).astype('>u4').tobytes()
+    else:
+        packed_values = array(UINT32_TYPECODE, values)
+        if sys.byteorder == 'little':
+            packed_values.byteswap()
+        packed: bytes = packed_values.tobytes()
+
+    view = memoryview(packed)
+    return [_inet_ntop4(view[i : i + 4]) for i in range(0, len(view), 4)]
+
+
+def get_subnet_mask_values(slashes: Iterable[str]) -> IPv4Values:
+    """
+    Batch version of get_subnet_mask_value().
+
+    Example:
+    >>> values_to_ipv4s(get_subnet_mask_values(['/16', '10.20.30.40/23']))
+    ['255.255.0.0', '255.255.254.0']
+    """
+
+    masks = array(UINT32_TYPECODE, map(get_subnet_mask_value, slashes))
+    np = numpy_for(masks)
+    if np is not None:
+        return np.frombuffer(masks, dtype=np.uint32).copy()
+    return masks
+
+
+def apply_masks(
+    values: Union[IPv4Values, Iterable[str]],
+    masks: Union[int, IPv4Values],
+) -> IPv4Values:
+    """
+    Bitwise-and every value with its mask, returning the network numbers.
+
+    `values` can be an array of 32-bit values or an iterable of
+    dots-and-numbers strings. `masks` is either a single mask applied to
+    every value or an array of masks of the same length as `values`.
+
+    Example:
+    >>> values_to_ipv4s(apply_masks(['10.23.121.17', '1.2.3.4'], 0xffffff00))
+    ['10.23.121.0', '1.2.3.0']
+    """
+
+    if not _is_value_array(values):
+        values = ipv4s_to_values(values)
+
+    np = numpy_for(values)
+    if np is None and not isinstance(masks, int):
+        np = numpy_for(masks)
+    if np is not None:
+        return np.bitwise_and(values, np.asarray(masks, dtype=np.uint32))
+
+    if isinstance(masks, int):
+        return array(UINT32_TYPECODE, [value & masks for value in values])
+    if len(masks) != len(values):
+        raise ValueError('values and masks must be the same length')
+    return array(UINT32_TYPECODE, map(operator.and_, values, masks))
+
+
+def ips_same_subnets(
+    ips1: Union[IPv4Values, Iterable[str]],
+    ips2: Union[IPv4Values, Iterable[str]],
+    slash: Union[str, Iterable[str]],
+) -> Sequence[bool]:
+    """
+    Batch version of ips_same_subnet(): compare `ips1[i]` and `ips2[i]` for
+    every `i` at once.
+
+    `slash` is either one subnet mask in slash notation used for every pair,
+    or one mask per pair.
+
+    Returns a NumPy boolean array, or an `array('B')` of 0/1 flags when
+    NumPy is not installed.
+
+    Example:
+    >>> same = ips_same_subnets(
+    ...     ['10.23.121.17', '10.23.230.22'],
+    ...     ['10.23.121.225', '10.24.121.225'],
+    ...     '/23',
+    ... )
+    >>> [bool(flag) for flag in same]
+    [True, False]
+    """
+
+    if isinstance(slash, str):
+        masks: Union[int, IPv4Values] = get_subnet_mask_value(slash)
+    else:
+        masks = get_subnet_mask_values(slash)
+
+    networks1 = apply_masks(ips1, masks)
+    networks2 = apply_masks(ips2, masks)
+    if len(networks1) != len(networks2):
+        raise ValueError('ips1 and ips2 must be the same length')
+
+    if numpy_for(networks1) or numpy_for(networks2):
+        return networks1 == networks2
+    return array('B', map(operator.eq, networks1, networks2))
+
+
 ## -------------------------------------------
 ## The below is provided by Beej's source code
 ## -------------------------------------------
 
 
 def usage():
-    print('usage: netfuncs.py infile.json', file=sys.stderr)
+    print('usage: netfuncs.py [--profile[=FILE]] infile.json', file=sys.stderr)
 
 
 def read_routers(file_name):
-    with open(file_name) as fp:
-        json_data = fp.read()
-    return json.loads(json_data)
+    # Streams JSON (or maps a binary snapshot) instead of reading the whole file into a string
+    from chapter19 import routerfile
+
+    return routerfile.load_routers(file_name)
 
 
 def print_routers(routers):
@@ -217,10 +543,17 @@ def print_same_subnets(src_dest_pairs):
 
     src_dest_pairs_list = sorted(src_dest_pairs)
 
-    for src_ip, dest_ip in src_dest_pairs_list:
+    # Compare every pair in one batch rather than one call per pair
+    same_subnets = ips_same_subnets(
+        [src_ip for src_ip, _ in src_dest_pairs_list],
+        [dest_ip for _, dest_ip in src_dest_pairs_list],
+        '/24',
+    )
+
+    for (src_ip, dest_ip), same in zip(src_dest_pairs_list, same_subnets):
         print(f' {src_ip:>15s} {dest_ip:>15s}: ', end='')
 
-        if ips_same_subnet(src_ip, dest_ip, '/24'):
+        if same:
             print('same subnet')
         else:
             print('different subnets')
@@ -229,43 +562,61 @@ def print_same_subnets(src_dest_pairs):
 def print_ip_routers(routers, src_dest_pairs):
     print('Routers and corresponding IPs:')
 
-    all_ips = sorted(set([i for pair in src_dest_pairs for i in pair]))
+    from chapter19.assign import RouterTable, assign_routers
 
-    router_host_map = {}
+    all_ips = [i for pair in src_dest_pairs for i in pair]
 
-    for ip in all_ips:
-        router = str(find_router_for_ip(routers, ip))
-
-        if router not in router_host_map:
-            router_host_map[router] = []
-
-        router_host_map[router].append(ip)
+    table = RouterTable(routers)
+    router_host_map = {
+        str(router): ips for router, ips in assign_routers(table, all_ips).items()
+    }
 
     for router_ip in sorted(router_host_map.keys()):
         print(f' {router_ip:>15s}: {router_host_map[router_ip]}')
 
+    # For --profile's lookup count
+    return table
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
 
-def main(argv):
     if 'my_tests' in globals() and callable(my_tests):
         my_tests()
         return 0
 
+    from chapter19 import profiling
+
+    profiler, argv = profiling.from_argv(argv)
+
     try:
         router_file_name = argv[1]
     except:
         usage()
         return 1
 
-    json_data = read_routers(router_file_name)
-
-    routers = json_data['routers']
-    src_dest_pairs = json_data['src-dest']
-
-    print_routers(routers)
-    print()
-    print_same_subnets(src_dest_pairs)
-    print()
-    print_ip_routers(routers, src_dest_pairs)
+    with profiler:
+        with profiler.stage('load'):
+            json_data = read_routers(router_file_name)
+
+        routers = json_data['routers']
+        src_dest_pairs = json_data['src-dest']
+
+        with profiler.stage('print_routers'):
+            print_routers(routers)
+        print()
+        with profiler.stage('same_subnets'):
+            print_same_subnets(src_dest_pairs)
+        print()
+        with profiler.stage('ip_routers'):
+            table = print_ip_routers(routers, src_dest_pairs)
+
+        profiler.count('routers', len(routers))
+        profiler.count('pairs', len(src_dest_pairs))
+        profiler.count('lookups', table.lookups)
+        for cache_name, stats in cache_stats().items():
+            profiler.count(f'{cache_name}_hits', stats['hits'])
+            profiler.count(f'{cache_name}_misses', stats['misses'])
 
 
 if __name__ == '__main__':
@@ -0,0 +1,240 @@
+"""
+$ python -m chapter19.prefixes chapter19/tests/example1.json
+
+Auditing the subnets in a router table: duplicate and overlapping prefixes,
+the minimal set of supernets covering them, and "which prefixes contain X" /
+"which prefixes does X contain" queries.
+
+Every router's subnet is a (network, broadcast) pair of integers, i.e. the
+closed interval of addresses it covers. Two CIDR prefixes are either disjoint
+or one is nested inside the other, so sorting the intervals by network (and
+widest first on ties) is enough to answer all of the above with a single
+sweep or a binary search, in O(n log n) rather than comparing every pair.
+"""
+
+import sys
+import bisect
+
+from typing import Iterable, Iterator, NamedTuple, Union
+
+from chapter19 import netfuncs
+
+
+class Prefix(NamedTuple):
+    network: int
+    broadcast: int
+
+    @property
+    def slash(self) -> int:
+        return 32 - (self.broadcast - self.network).bit_length()
+
+    def contains(self, other: 'Prefix') -> bool:
+        return (
+            self.network <= other.network and other.broadcast <= self.broadcast
+        )
+
+    def __str__(self) -> str:
+        return f'{netfuncs.value_to_ipv4(self.network)}/{self.slash}'
+
+
+def parse_prefix(prefix: str) -> Prefix:
+    """
+    Parse "a.b.c.d/n" (or a bare address, which is treated as a /32) into a
+    Prefix. Host bits are discarded.
+
+    Example:
+    >>> parse_prefix('10.23.121.17/23')
+    Prefix(network=169310208, broadcast=169310719)
+    >>> str(parse_prefix('10.23.121.17/23'))
+    '10.23.120.0/23'
+    """
+
+    ip, _, slash = prefix.partition('/')
+    return prefix_from_router(ip, f'/{slash or 32}')
+
+
+def prefix_from_router(router_ip: str, slash: str) -> Prefix:
+    mask = netfuncs.get_subnet_mask_value(slash)
+    network = netfuncs.get_network(netfuncs.ipv4_to_value(router_ip), mask)
+    return Prefix(network, network | (~mask & 0xFFFFFFFF))
+
+
+def range_to_prefixes(start: int, end: int) -> Iterator[Prefix]:
+    """
+    Cover the address range [start, end] with the fewest CIDR prefixes.
+
+    Example:
+    >>> [str(p) for p in range_to_prefixes(0x0A000000, 0x0A0002FF)]
+    ['10.0.0.0/23', '10.0.2.0/24']
+    """
+
+    while start <= end:
+        # The biggest block that is aligned on `start`...
+        size = start & -start if start else 1 << 32
+        # ...and doesn't run past `end`
+        while size > end - start + 1:
+            size >>= 1
+        yield Prefix(start, start + size - 1)
+        start += size
+
+
+class PrefixIndex:
+    """
+    A sorted interval index over the prefixes in a router table.
+
+    `owners` maps each distinct prefix to the routers that have it;
+    `prefixes` holds the distinct prefixes ordered by network, widest first.
+    """
+
+    def __init__(self, owned_prefixes: Iterable[tuple[Prefix, str]]):
+        self.owners: dict[Prefix, list[str]] = {}
+        for prefix, owner in owned_prefixes:
+            self.owners.setdefault(prefix, []).append(owner)
+
+        self.prefixes: list[Prefix] = sorted(
+            self.owners, key=lambda prefix: (prefix.network, -prefix.broadcast)
+        )
+        self._networks: list[int] = [prefix.network for prefix in self.prefixes]
+
+    @classmethod
+    def from_routers(cls, routers: dict[str, dict[str, str]]) -> 'PrefixIndex':
+        return cls(
+            (prefix_from_router(router_ip, router_info['netmask']), router_ip)
+            for router_ip, router_info in routers.items()
+        )
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+    def duplicates(self) -> dict[Prefix, list[str]]:
+        """Prefixes that more than one router claims."""
+        return {
+            prefix: owners
+            for prefix, owners in self.owners.items()
+            if len(owners) > 1
+        }
+
+    def overlaps(self) -> list[tuple[Prefix, Prefix]]:
+        """
+        Every (outer, inner) pair where `inner` is nested inside `outer`.
+
+        Sweeps the sorted prefixes keeping a stack of the ones still "open":
+        anything on the stack that ends before the current prefix starts is
+        closed, and whatever is left on the stack contains it.
+        """
+
+        nested = []
+        open_prefixes: list[Prefix] = []
+        for prefix in self.prefixes:
+            while (
+                open_prefixes and open_prefixes[-1].broadcast < prefix.network
+            ):
+                open_prefixes.pop()
+            nested.extend((outer, prefix) for outer in open_prefixes)
+            open_prefixes.append(prefix)
+        return nested
+
+    def aggregate(self) -> list[Prefix]:
+        """
+        The minimal list of prefixes covering exactly the same addresses:
+        nested prefixes are dropped and adjacent ones are merged into
+        supernets.
+
+        Example:
+        >>> index = PrefixIndex.from_routers({
+        ...     '10.0.0.1': {'netmask': '/24'},
+        ...     '10.0.1.1': {'netmask': '/24'},
+        ...     '10.0.1.129': {'netmask': '/25'},
+        ... })
+        >>> [str(p) for p in index.aggregate()]
+        ['10.0.0.0/23']
+        """
+
+        supernets = []
+        start = end = None
+        for prefix in self.prefixes:
+            if start is not None and prefix.network <= end + 1:
+                end = max(end, prefix.broadcast)
+                continue
+            if start is not None:
+                supernets.extend(range_to_prefixes(start, end))
+            start, end = prefix
+        if start is not None:
+            supernets.extend(range_to_prefixes(start, end))
+        return supernets
+
+    def containing(self, query: Union[str, Prefix]) -> list[Prefix]:
+        """
+        Prefixes that contain `query` (a Prefix, "a.b.c.d/n" or an address),
+        widest first. There are at most 33 candidates, one per slash length.
+        """
+
+        query = parse_prefix(query) if isinstance(query, str) else query
+        found = []
+        for slash in range(query.slash + 1):
+            mask = netfuncs.SUBNET_MASKS[slash]
+            candidate = Prefix(
+                query.network & mask,
+                (query.network & mask) | (~mask & 0xFFFFFFFF),
+            )
+            if candidate in self.owners:
+                found.append(candidate)
+        return found
+
+    def contained_by(self, query: Union[str, Prefix]) -> list[Prefix]:
+        """Prefixes inside `query`, including `query` itself if present."""
+
+        query = parse_prefix(query) if isinstance(query, str) else query
+        lo = bisect.bisect_left(self._networks, query.network)
+        hi = bisect.bisect_right(self._networks, query.broadcast)
+        # Anything starting inside `query` is nested in it, unless it starts
+        # at the same network and is wider
+        return [
+            prefix
+            for prefix in self.prefixes[lo:hi]
+            if prefix.broadcast <= query.broadcast
+        ]
+
+
+## -------------------------------------------
+## Audit report
+## -------------------------------------------
+
+
+def print_audit(routers: dict[str, dict[str, str]]) -> None:
+    index = PrefixIndex.from_routers(routers)
+
+    print(f'Prefixes: {len(index)} distinct across {len(routers)} routers')
+
+    print('Duplicate prefixes:')
+    for prefix, owners in index.duplicates().items():
+        print(f' {str(prefix):>18s}: {owners}')
+
+    print('Overlapping prefixes:')
+    for outer, inner in index.overlaps():
+        print(f' {str(outer):>18s} contains {inner}')
+
+    print('Aggregated supernets:')
+    for supernet in index.aggregate():
+        print(f' {str(supernet):>18s}')
+
+
+def usage():
+    print('usage: prefixes.py infile.json', file=sys.stderr)
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    try:
+        router_file_name = argv[1]
+    except IndexError:
+        usage()
+        return 1
+
+    json_data = netfuncs.read_routers(router_file_name)
+    print_audit(json_data['routers'])
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
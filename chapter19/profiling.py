@@ -0,0 +1,197 @@
+"""
+Per-stage timing and counters for the CLIs' --profile option.
+
+A Profiler times named stages with a context manager, keeps counters, and
+writes everything out as JSON lines, one object per line:
+
+    {"event": "stage", "name": "load", "seconds": 0.0123}
+    {"event": "counter", "name": "settled", "value": 4096}
+    {"event": "function", "function": "graph.py:118(dijkstra)", "calls": 20, ...}
+
+Example:
+>>> import io
+>>> out = io.StringIO()
+>>> profiler = Profiler(out)
+>>> with profiler.stage('parse'):
+...     values = [int(s) for s in '1 2 3'.split()]
+>>> profiler.count('values', len(values))
+>>> profiler.close()
+>>> [line.split(',')[0] for line in out.getvalue().splitlines()]
+['{"event": "stage"', '{"event": "counter"']
+
+A disabled Profiler (the default) does nothing, so code can time its stages
+unconditionally.
+
+The CLIs take:
+    --profile             JSON lines to stderr
+    --profile=FILE        JSON lines to FILE (stderr if FILE is empty)
+    --profile-cprofile    also the top functions by cumulative time
+    --profile-tracemalloc also memory allocated and peak memory per stage
+"""
+
+import sys
+import json
+import time
+import contextlib
+
+from typing import Iterator, TextIO, Union
+
+# How many functions the cProfile summary lists
+PROFILE_TOP_FUNCTIONS = 20
+
+
+class Profiler:
+    def __init__(
+        self,
+        output: Union[TextIO, str, None] = None,
+        cprofile: bool = False,
+        memory: bool = False,
+        top: int = PROFILE_TOP_FUNCTIONS,
+    ):
+        """
+        Disabled unless given an `output` to write to: a stream, or a file
+        name to open on the first write (and close again in close()).
+
+        cProfile and tracemalloc only start once the `with` block is
+        entered, so a CLI can bail out over bad arguments first without
+        leaving anything open or running.
+        """
+
+        self._file_name = output if isinstance(output, str) else None
+        self.output = None if self._file_name else output
+        self.enabled = output is not None
+        self.counters: dict[str, int] = {}
+        self.top = top
+        self.cprofile = cprofile
+        self.memory = memory
+        self._tracemalloc = None
+        self._profile = None
+
+    def start(self) -> None:
+        """Start cProfile and tracemalloc, if they were asked for."""
+
+        if self.enabled and self.memory and self._tracemalloc is None:
+            import tracemalloc
+
+            self._tracemalloc = tracemalloc
+            tracemalloc.start()
+        if self.enabled and self.cprofile and self._profile is None:
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def emit(self, event: str, **fields) -> None:
+        if self.enabled:
+            if self.output is None:
+                self.output = open(self._file_name, 'w')
+            print(json.dumps({'event': event, **fields}), file=self.output)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the body of the `with` block as stage `name`."""
+
+        if not self.enabled:
+            yield
+            return
+
+        if self._tracemalloc:
+            self._tracemalloc.reset_peak()
+            allocated_before = self._tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            fields = {'seconds': round(time.perf_counter() - start, 6)}
+            if self._tracemalloc:
+                allocated, peak = self._tracemalloc.get_traced_memory()
+                fields['allocated_bytes'] = allocated - allocated_before
+                fields['peak_bytes'] = peak
+            self.emit('stage', name=name, **fields)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def update(self, counters: dict[str, int], prefix: str = '') -> None:
+        """Add a whole dict of counts, e.g. a search's `stats`."""
+        for name, n in counters.items():
+            self.count(prefix + name, n)
+
+    def close(self) -> None:
+        """Write out the counters and cProfile summary, and stop tracing."""
+
+        if not self.enabled:
+            return
+
+        for name, value in self.counters.items():
+            self.emit('counter', name=name, value=value)
+
+        if self._profile:
+            self._profile.disable()
+            self._emit_functions()
+        if self._tracemalloc:
+            self._tracemalloc.stop()
+
+        self.enabled = False
+        if self._file_name and self.output is not None:
+            self.output.close()
+
+    def _emit_functions(self) -> None:
+        import pstats
+
+        stats = pstats.Stats(self._profile).stats
+        # (file, line, function) -> (primitive calls, calls, total, cumulative, callers)
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        for (file_name, line, function), (
+            _,
+            calls,
+            total,
+            cumulative,
+            _,
+        ) in rows[: self.top]:
+            self.emit(
+                'function',
+                function=f'{file_name.rsplit("/", 1)[-1]}:{line}({function})',
+                calls=calls,
+                total_seconds=round(total, 6),
+                cumulative_seconds=round(cumulative, 6),
+            )
+
+    def __enter__(self) -> 'Profiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def from_argv(argv: list[str]) -> tuple[Profiler, list[str]]:
+    """
+    Pull the --profile options out of a command line. Returns a Profiler
+    (disabled if there were none) and the remaining arguments.
+
+    >>> profiler, argv = from_argv(['netfuncs.py', '--profile', 'in.json'])
+    >>> profiler.enabled, argv
+    (True, ['netfuncs.py', 'in.json'])
+    """
+
+    output = None
+    cprofile = memory = False
+    rest = []
+    for arg in argv:
+        if arg == '--profile':
+            output = output or sys.stderr
+        elif arg.startswith('--profile='):
+            # An empty FILE means stderr, like plain --profile
+            output = arg.split('=', 1)[1] or sys.stderr
+        elif arg == '--profile-cprofile':
+            cprofile = True
+        elif arg == '--profile-tracemalloc':
+            memory = True
+        else:
+            rest.append(arg)
+
+    if output is None and (cprofile or memory):
+        output = sys.stderr
+    return Profiler(output, cprofile, memory), rest
@@ -0,0 +1,412 @@
+"""
+Loading router tables without holding the whole file in memory twice.
+
+$ python -m chapter19.routerfile chapter19/tests/example1.json example1.snapshot
+
+Two ways in:
+
+- JSON files (the format Beej's projects use) are streamed: the "routers"
+  and "src-dest" sections are decoded one entry at a time from a small
+  rolling buffer, instead of `fp.read()` followed by `json.loads()`.
+- Binary snapshots (written by write_snapshot()) store the topology as flat
+  arrays (router prefixes plus CSR adjacency). They are memory-mapped
+  and used in place, so opening one costs next to nothing however big it is.
+"""
+
+import sys
+import json
+import mmap
+import struct
+
+from array import array
+from typing import Any, Iterator, TextIO
+
+from chapter19 import netfuncs
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+SNAPSHOT_MAGIC = b'RTRSNAP2'
+# magic, byte-order mark, router count, edge count, src-dest pair count
+SNAPSHOT_HEADER = struct.Struct('=8sIIII')
+SNAPSHOT_BYTE_ORDER_MARK = 0x01020304
+UINT32_TYPECODE = netfuncs.UINT32_TYPECODE
+# 'ad's are stored as float64, like CompiledGraph.weights
+WEIGHT_TYPECODE = 'd'
+
+_decoder = json.JSONDecoder()
+# Characters that can carry on a JSON number
+_NUMBER_CHARS = frozenset('.eE+-0123456789')
+
+
+## -------------------------------------------
+## Streaming JSON
+## -------------------------------------------
+
+
+class _JSONStream:
+    """
+    A rolling buffer over a text file that hands out one JSON value at a
+    time. Only the top-level structure is walked by hand; each value inside
+    it is decoded with `JSONDecoder.raw_decode`, topping up the buffer
+    whenever a value runs past the end of what has been read so far.
+    """
+
+    def __init__(self, fp: TextIO, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop everything already consumed so the buffer stays small
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at the end)."""
+        while True:
+            while (
+                self.pos < len(self.buffer)
+                and self.buffer[self.pos] in ' \t\r\n'
+            ):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f'Expected {char!r} but found {found!r} in router file'
+            )
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            # A number at the buffer edge may have been cut short, either
+            # right at the end ('12|34') or where what's left still parses
+            # ('1.|5', '1.5|e10'). Valid JSON never has a number character
+            # straight after a number, so seeing one means read on.
+            if (
+                isinstance(obj, (int, float))
+                and (
+                    end == len(self.buffer) or self.buffer[end] in _NUMBER_CHARS
+                )
+                and not self.eof
+                and self._fill()
+            ):
+                continue
+            self.pos = end
+            return obj
+
+    def _members(self, close: str) -> Iterator[None]:
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ',':
+                self.pos += 1
+            else:
+                self.expect(close)
+                return
+
+    def iter_object(self) -> Iterator[tuple[str, Any]]:
+        self.expect('{')
+        for _ in self._members('}'):
+            key = self.value()
+            self.expect(':')
+            yield key, self.value()
+
+    def iter_array(self) -> Iterator[Any]:
+        self.expect('[')
+        for _ in self._members(']'):
+            yield self.value()
+
+
+def iter_sections(
+    fp: TextIO, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[tuple[str, Any]]:
+    """
+    Stream a router JSON file, yielding `(section, item)` pairs:
+
+    - ('routers', (router_ip, router_info)) for every router,
+    - ('src-dest', [src_ip, dest_ip]) for every pair,
+    - (key, value) for any other top-level key.
+
+    Example:
+    >>> with open('chapter19/tests/example1.json') as fp:
+    ...     next(iter_sections(fp))  # doctest: +ELLIPSIS
+    ('routers', ('10.34.98.1', {'connections': {...}, 'netmask': '/24', ...}))
+    """
+
+    stream = _JSONStream(fp, chunk_size)
+    for key, _ in _top_level(stream):
+        if key == 'routers':
+            for router in stream.iter_object():
+                yield key, router
+        elif key == 'src-dest':
+            for pair in stream.iter_array():
+                yield key, pair
+        else:
+            yield key, stream.value()
+
+
+def _top_level(stream: _JSONStream) -> Iterator[tuple[str, None]]:
+    stream.expect('{')
+    for _ in stream._members('}'):
+        key = stream.value()
+        stream.expect(':')
+        yield key, None
+
+
+def iter_routers(file_name: str) -> Iterator[tuple[str, dict]]:
+    with open(file_name) as fp:
+        for section, item in iter_sections(fp):
+            if section == 'routers':
+                yield item
+
+
+def iter_src_dest(file_name: str) -> Iterator[list[str]]:
+    with open(file_name) as fp:
+        for section, item in iter_sections(fp):
+            if section == 'src-dest':
+                yield item
+
+
+## -------------------------------------------
+## Binary snapshots
+## -------------------------------------------
+#
+# Layout (native byte order):
+#
+#   header       SNAPSHOT_HEADER
+#   weights      [edge_count]        float64: the 'ad' of each edge
+#   router_ips   [router_count]      uint32 from here on
+#   prefixes     [router_count]      slash length of each router's netmask
+#   offsets      [router_count + 1]  CSR: edges of router i are offsets[i]:offsets[i+1]
+#   targets      [edge_count]        router index at the other end of each edge
+#   pairs        [2 * pair_count]    src, dest, src, dest, ...
+#
+# The header is a multiple of 8 bytes, so putting the weights first keeps
+# them 8-byte aligned.
+
+
+def write_snapshot(json_data: dict, file_name: str) -> None:
+    """
+    Write the 'routers' and 'src-dest' sections of a parsed router file to a
+    binary snapshot.
+
+    Only what routing needs is kept: router IPs, netmasks, connections and
+    their 'ad'. Interface names and per-connection netmasks are dropped.
+    """
+
+    routers: dict = json_data['routers']
+    pairs: list = json_data.get('src-dest', [])
+
+    router_ips = list(routers)
+    router_index = {router_ip: i for i, router_ip in enumerate(router_ips)}
+
+    prefixes = array(UINT32_TYPECODE)
+    offsets = array(UINT32_TYPECODE, [0])
+    targets = array(UINT32_TYPECODE)
+    weights = array(WEIGHT_TYPECODE)
+
+    for router_ip in router_ips:
+        router_info = routers[router_ip]
+        prefixes.append(int(router_info['netmask'].split('/')[1]))
+        for neighbour_ip, connection in router_info.get(
+            'connections', {}
+        ).items():
+            if neighbour_ip not in router_index:
+                raise ValueError(
+                    f'Router {router_ip} is connected to unknown router {neighbour_ip}'
+                )
+            targets.append(router_index[neighbour_ip])
+            weights.append(connection['ad'])
+        offsets.append(len(targets))
+
+    flat_pairs = [ip for pair in pairs for ip in pair]
+
+    with open(file_name, 'wb') as fp:
+        fp.write(
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_BYTE_ORDER_MARK,
+                len(router_ips),
+                len(targets),
+                len(pairs),
+            )
+        )
+        fp.write(weights.tobytes())
+        for values in (
+            netfuncs.ipv4s_to_values(router_ips),
+            prefixes,
+            offsets,
+            targets,
+            netfuncs.ipv4s_to_values(flat_pairs),
+        ):
+            fp.write(array(UINT32_TYPECODE, values).tobytes())
+
+
+def is_snapshot(file_name: str) -> bool:
+    with open(file_name, 'rb') as fp:
+        return fp.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+class Snapshot:
+    """
+    A memory-mapped router snapshot. The arrays are memoryviews straight
+    onto the file, so nothing is parsed or copied until it is used.
+
+    Use it as a context manager (or call close()) to release the mapping.
+    """
+
+    def __init__(self, file_name: str):
+        self._fp = open(file_name, 'rb')
+        self._mmap = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, byte_order_mark, router_count, edge_count, pair_count = (
+            SNAPSHOT_HEADER.unpack_from(self._mmap)
+        )
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError(f'{file_name} is not a router snapshot')
+        if byte_order_mark != SNAPSHOT_BYTE_ORDER_MARK:
+            self.close()
+            raise ValueError(
+                f'{file_name} was written with a different byte order'
+            )
+
+        self.router_count = router_count
+        self.edge_count = edge_count
+        self.pair_count = pair_count
+
+        self._offset = SNAPSHOT_HEADER.size
+        self.weights = self._take(edge_count, WEIGHT_TYPECODE)
+        self.router_ips = self._take(router_count)
+        self.prefixes = self._take(router_count)
+        self.offsets = self._take(router_count + 1)
+        self.targets = self._take(edge_count)
+        self.pairs = self._take(2 * pair_count)
+
+    def _take(self, count: int, typecode: str = UINT32_TYPECODE) -> memoryview:
+        size = array(typecode).itemsize
+        start, self._offset = self._offset, self._offset + size * count
+        return self._view[start : self._offset].cast(typecode)
+
+    def routers(self) -> dict[str, dict]:
+        """Rebuild the 'routers' dictionary in the JSON file's schema."""
+
+        router_ips = netfuncs.values_to_ipv4s(self.router_ips)
+        netmasks = [f'/{prefix}' for prefix in self.prefixes]
+
+        routers = {}
+        for i, router_ip in enumerate(router_ips):
+            connections = {}
+            for edge in range(self.offsets[i], self.offsets[i + 1]):
+                target = self.targets[edge]
+                connections[router_ips[target]] = {
+                    'netmask': netmasks[target],
+                    'ad': self.weights[edge],
+                }
+            routers[router_ip] = {
+                'connections': connections,
+                'netmask': netmasks[i],
+                'if_count': len(connections),
+            }
+        return routers
+
+    def src_dest(self) -> list[list[str]]:
+        ips = netfuncs.values_to_ipv4s(self.pairs)
+        return [ips[i : i + 2] for i in range(0, len(ips), 2)]
+
+    def close(self) -> None:
+        for name in (
+            'router_ips',
+            'prefixes',
+            'offsets',
+            'targets',
+            'weights',
+            'pairs',
+        ):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._view.release()
+        self._mmap.close()
+        self._fp.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def load_snapshot(file_name: str) -> Snapshot:
+    return Snapshot(file_name)
+
+
+def load_routers(file_name: str) -> dict:
+    """
+    Drop-in replacement for `json.loads(open(file_name).read())`: returns a
+    dictionary with 'routers' and 'src-dest' keys, read from either a JSON
+    file (streamed) or a binary snapshot.
+    """
+
+    if is_snapshot(file_name):
+        with load_snapshot(file_name) as snapshot:
+            return {
+                'routers': snapshot.routers(),
+                'src-dest': snapshot.src_dest(),
+            }
+
+    json_data: dict = {'routers': {}, 'src-dest': []}
+    with open(file_name) as fp:
+        for section, item in iter_sections(fp):
+            if section == 'routers':
+                router_ip, router_info = item
+                json_data['routers'][router_ip] = router_info
+            elif section == 'src-dest':
+                json_data['src-dest'].append(item)
+            else:
+                json_data[section] = item
+    return json_data
+
+
+def usage():
+    print('usage: routerfile.py infile.json outfile.snapshot', file=sys.stderr)
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    try:
+        json_file_name = argv[1]
+        snapshot_file_name = argv[2]
+    except IndexError:
+        usage()
+        return 1
+
+    write_snapshot(load_routers(json_file_name), snapshot_file_name)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
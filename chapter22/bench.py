@@ -0,0 +1,120 @@
+"""
+$ python -m chapter22.bench --sizes 100 1000 10000 --shapes grid isp
+
+Scaling benchmark for the router lookups and path finding, on synthetic
+topologies from chapter22.topogen.
+
+Before timing anything it checks that both CLIs still reproduce the example
+outputs that ship with the book (chapter19/tests and chapter22).
+"""
+
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+from pathlib import Path
+
+from chapter19 import netfuncs
+from chapter22 import dijkstra, topogen
+from chapter22.graph import CompiledGraph
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (CLI main, input file, expected output)
+EXAMPLES = [
+    (
+        netfuncs.main,
+        ROOT / 'chapter19/tests/example1.json',
+        ROOT / 'chapter19/tests/example1_output.txt',
+    ),
+    (
+        dijkstra.main,
+        ROOT / 'chapter22/example1.json',
+        ROOT / 'chapter22/example1_output.txt',
+    ),
+]
+
+
+def check_examples() -> bool:
+    ok = True
+    for main, input_file, expected_file in EXAMPLES:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            main(['', str(input_file)])
+        matches = output.getvalue() == expected_file.read_text()
+        print(
+            f'{input_file.relative_to(ROOT)}: {"ok" if matches else "MISMATCH"}'
+        )
+        ok = ok and matches
+    return ok
+
+
+def per_call_ms(func, calls: list[tuple]) -> float:
+    start = time.perf_counter()
+    for args in calls:
+        func(*args)
+    return 1e3 * (time.perf_counter() - start) / max(1, len(calls))
+
+
+def bench_topology(shape: str, size: int, queries: int, seed: int) -> dict:
+    json_data = topogen.generate(shape, size, pairs=queries, seed=seed)
+    routers = json_data['routers']
+    pairs = json_data['src-dest']
+
+    start = time.perf_counter()
+    graph = CompiledGraph.from_routers(routers)
+    compile_ms = 1e3 * (time.perf_counter() - start)
+
+    return {
+        'compile_ms': compile_ms,
+        'find_router_ms': per_call_ms(
+            netfuncs.find_router_for_ip,
+            [(routers, src_ip) for src_ip, _ in pairs],
+        ),
+        'lookup_ms': per_call_ms(
+            graph.find_router, [(src_ip,) for src_ip, _ in pairs]
+        ),
+        'path_ms': per_call_ms(
+            dijkstra.dijkstras_shortest_path,
+            [(routers, src_ip, dest_ip, graph) for src_ip, dest_ip in pairs],
+        ),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[100, 1_000, 10_000]
+    )
+    parser.add_argument(
+        '--shapes',
+        nargs='+',
+        choices=topogen.SHAPES,
+        default=list(topogen.SHAPES),
+    )
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv[1:])
+
+    if not check_examples():
+        return 1
+
+    columns = ('compile_ms', 'find_router_ms', 'lookup_ms', 'path_ms')
+    print()
+    print(
+        f'{"shape":>10s} {"routers":>8s} '
+        + ' '.join(f'{c:>15s}' for c in columns)
+    )
+    for shape in args.shapes:
+        for size in args.sizes:
+            results = bench_topology(shape, size, args.queries, args.seed)
+            print(
+                f'{shape:>10s} {size:>8d} '
+                + ' '.join(f'{results[c]:>15.3f}' for c in columns)
+            )
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
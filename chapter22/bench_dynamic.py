@@ -0,0 +1,83 @@
+"""
+$ python -m chapter22.bench_dynamic --routers 20000 --sources 20 --events 200
+
+Replays a stream of link flaps (a link goes down, then comes back up with a
+new 'ad') against a set of cached shortest-path trees, and compares
+repairing the trees in place with recomputing them from scratch after every
+event. The repaired trees are checked against the recomputed ones.
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from chapter22.dynamic import DynamicRoutingService
+from chapter22.graph import dijkstra
+from chapter22.topogen import random_routers
+
+
+def flap_events(routers: dict, count: int, rng: random.Random) -> list[tuple]:
+    router_ips = list(routers)
+    events = []
+    while len(events) < count:
+        a = rng.choice(router_ips)
+        b = rng.choice(list(routers[a]['connections']))
+        events.append(('down', a, b))
+        events.append(('up', a, b, rng.randint(1, 128)))
+    return events[:count]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--routers', type=int, default=20_000)
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--sources', type=int, default=20)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv[1:])
+
+    rng = random.Random(args.seed)
+    routers = random_routers(args.routers, args.degree, rng)
+    events = flap_events(routers, args.events, rng)
+
+    service = DynamicRoutingService.from_routers(
+        routers, cache_size=args.sources
+    )
+    sources = rng.sample(range(len(service.graph)), args.sources)
+    for source in sources:
+        service.tree(source)
+
+    start = time.perf_counter()
+    service.replay(events)
+    incremental = time.perf_counter() - start
+
+    # The same events, throwing the trees away and recomputing after each one
+    baseline = DynamicRoutingService.from_routers(
+        routers, cache_size=args.sources
+    )
+    start = time.perf_counter()
+    for event in events:
+        baseline.apply(event)
+        for source in sources:
+            dijkstra(baseline.graph, source)
+    recompute = time.perf_counter() - start
+
+    print(
+        f'{args.routers} routers, {args.sources} cached trees, {len(events)} events'
+    )
+    print(
+        f' incremental: {incremental:8.3f}s ({1e3 * incremental / len(events):.3f} ms/event)'
+    )
+    print(
+        f'   recompute: {recompute:8.3f}s ({1e3 * recompute / len(events):.3f} ms/event)'
+    )
+
+    for source in sources:
+        if service.tree(source)[0] != dijkstra(service.graph, source)[0]:
+            print(f'repaired tree for node {source} is wrong!', file=sys.stderr)
+            return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
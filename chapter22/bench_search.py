@@ -0,0 +1,77 @@
+"""
+$ python -m chapter22.bench_search --routers 20000 --queries 200
+
+Runs the same random src -> dest queries through each point-to-point search
+algorithm on a synthetic topology. It reports how many routers each one
+settles and its latency, and checks that they all agree on the distance.
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from chapter22.graph import CompiledGraph
+from chapter22.search import (
+    ALGORITHMS,
+    LANDMARK_COUNT,
+    Landmarks,
+    point_to_point,
+)
+from chapter22.topogen import SHAPES, random_routers
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--routers', type=int, default=20_000)
+    parser.add_argument('--shape', choices=SHAPES, default='random')
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--landmarks', type=int, default=LANDMARK_COUNT)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv[1:])
+
+    rng = random.Random(args.seed)
+    routers = random_routers(args.routers, args.degree, rng, args.shape)
+    graph = CompiledGraph.from_routers(routers)
+    queries = [
+        (rng.randrange(len(graph)), rng.randrange(len(graph)))
+        for _ in range(args.queries)
+    ]
+
+    start = time.perf_counter()
+    landmarks = Landmarks(graph, args.landmarks, seed=args.seed)
+    print(
+        f'{args.routers} {args.shape} routers, {args.queries} queries, '
+        f'{args.landmarks} landmarks ({time.perf_counter() - start:.2f}s to precompute)'
+    )
+    print(
+        f'{"algorithm":>14s} {"settled":>10s} {"mean ms":>10s} {"p50 ms":>10s} {"p99 ms":>10s}'
+    )
+
+    distances = {}
+    for algorithm in ALGORITHMS:
+        settled = []
+        latencies = []
+        for source, target in queries:
+            start = time.perf_counter()
+            result = point_to_point(graph, source, target, algorithm, landmarks)
+            latencies.append(1e3 * (time.perf_counter() - start))
+            settled.append(result.settled)
+            distances.setdefault((source, target), set()).add(result.distance)
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+        print(
+            f'{algorithm:>14s} {statistics.mean(settled):>10.0f} '
+            f'{statistics.mean(latencies):>10.2f} {statistics.median(latencies):>10.2f} {p99:>10.2f}'
+        )
+
+    if any(len(found) > 1 for found in distances.values()):
+        print('algorithms disagree on some distances!', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,104 @@
+"""
+$ python -m chapter22.bench_startup --runs 10 --budget 50
+
+Launch cost of every CLI registered in pyproject.toml's [project.scripts].
+The tools get called thousands of times from shell pipelines, so the time
+spent importing before main() runs adds up.
+
+Each module is imported in a fresh interpreter under `python -X importtime`,
+and the median cumulative import time is reported with the slowest imports
+it pulled in. Modules that should only ever be imported on demand (NumPy,
+multiprocessing) are flagged if they show up at start-up. With --budget,
+the exit status is 1 if any tool is over budget or imports a heavy module.
+"""
+
+import sys
+import argparse
+import statistics
+import subprocess
+import tomllib
+
+from pathlib import Path
+
+PYPROJECT = Path(__file__).parent.parent / 'pyproject.toml'
+
+# Imported lazily, where they're needed; never at start-up
+HEAVY_MODULES = ('numpy', 'multiprocessing')
+
+
+def script_modules() -> dict[str, str]:
+    """Script name -> module, from [project.scripts]."""
+    with open(PYPROJECT, 'rb') as fp:
+        scripts = tomllib.load(fp)['project']['scripts']
+    return {name: target.split(':')[0] for name, target in scripts.items()}
+
+
+def import_times(module: str) -> tuple[dict[str, tuple[int, int]], set[str]]:
+    """
+    Import `module` in a fresh interpreter. Returns, for every module it
+    imported, (self, cumulative) import time in microseconds, and which of
+    HEAVY_MODULES ended up loaded.
+    """
+
+    check = f'import sys, {module}; print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', check],
+        cwd=PYPROJECT.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time:   self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, cumulative, name = line[len('import time:') :].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times, set(result.stdout.split())
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument(
+        '--top', type=int, default=3, help='slowest imports to show'
+    )
+    parser.add_argument('--budget', type=float, default=None, metavar='MS')
+    args = parser.parse_args(argv[1:])
+
+    failed = False
+    print(
+        f'{"script":>20s}  {"module":<28s} {"import ms":>9s}  slowest imports'
+    )
+    for name, module in script_modules().items():
+        runs = [import_times(module) for _ in range(args.runs)]
+        total = statistics.median(times[module][1] for times, _ in runs) / 1000
+
+        # Self time is noisy run to run; rank by the median run's numbers
+        runs.sort(key=lambda run: run[0][module][1])
+        times, heavy = runs[len(runs) // 2]
+        slowest = sorted(
+            (imported for imported in times if imported != module),
+            key=lambda imported: times[imported][0],
+            reverse=True,
+        )[: args.top]
+        notes = ', '.join(
+            f'{imported} {times[imported][0] / 1000:.1f}'
+            for imported in slowest
+        )
+        if heavy:
+            notes += f'  HEAVY: {" ".join(sorted(heavy))}'
+
+        over = args.budget is not None and total > args.budget
+        failed |= over or (args.budget is not None and bool(heavy))
+        print(
+            f'{name:>20s}  {module:<28s} {total:9.1f}{"!" if over else " "} {notes}'
+        )
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,18 +1,31 @@
 """
 $ python -m chapter22.dijkstra chapter22/example1.json
+$ python -m chapter22.dijkstra --profile --profile-cprofile chapter22/example1.json
+
+--profile writes per-stage timings and counters (nodes settled, edges
+relaxed, router lookups) as JSON lines to stderr; see chapter19.profiling
+for the other options.
 """
 
 import sys
-import json
-import math
 
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+from chapter19 import routerfile, profiling
+from chapter22.graph import CompiledGraph, shortest_path
+from chapter22.routing import RoutingService
 
-from chapter19 import netfuncs
+if TYPE_CHECKING:
+    from chapter22.search import Landmarks
 
 
 def dijkstras_shortest_path(
-    routers: dict, src_ip: str, dest_ip: str
+    routers: dict,
+    src_ip: str,
+    dest_ip: str,
+    graph: Optional[CompiledGraph] = None,
+    algorithm: str = 'dijkstra',
+    landmarks: Optional['Landmarks'] = None,
 ) -> list[str]:
     """
     This function takes a dictionary representing the network, a source
@@ -61,84 +74,90 @@ def dijkstras_shortest_path(
 
     The "ad" (Administrative Distance) field is the edge weight for that
     connection.
+
+    An empty list is returned if there is no route between the two routers.
+
+    `algorithm` picks the search: 'dijkstra' (the default), 'bidirectional'
+    or 'alt' (A* with `landmarks`, see chapter22.search).
     """
 
-    # First, find the router that belongs to the same subnet as the given src and dest IPs
-    start_router = netfuncs.find_router_for_ip(routers, src_ip)
-    end_router = netfuncs.find_router_for_ip(routers, dest_ip)
-    if start_router == end_router:  # we're already on the same subnet!
-        return []
-
-    # Apply Djikstra to find the shortest path between the source and dest routers
-    dist: dict[str, float] = {}
-    prev: dict[str, Optional[str]] = {}
-    queue = []
-
-    # initialisation
-    for router in routers:
-        dist[router] = math.inf
-        prev[router] = None
-        queue.append(router)
-    dist[start_router] = 0
-
-    # Greedily compute the shortest paths between each router using the Administrative Distance as edge-weights
-    while queue:
-        # Get the router in the queue that currently has the shortest distance
-        u = min(queue, key=dist.get)
-        queue.remove(u)
-
-        # Determine the next shortest distance
-        for neighbour_router, connection in routers[u]['connections'].items():
-            if neighbour_router in queue:
-                alt = dist[u] + connection['ad']
-                if alt < dist[neighbour_router]:
-                    dist[neighbour_router] = alt
-                    prev[neighbour_router] = u
-
-    # Now that we've computed the shortest distance traversals, construct the path of interest
-    # between the src and dest routers, by preceding backwards from the end_router
-    cur = end_router
-    path = []
-    while cur != start_router:
-        path.append(cur)
-        cur = prev[cur]
-    path.append(start_router)
-    return list(reversed(path))
+    # Compiling is O(V + E); pass in a graph from graph.CompiledGraph.from_routers()
+    # to share one between many queries
+    if graph is None:
+        graph = CompiledGraph.from_routers(routers)
+
+    # Find the routers on the same subnet as the src and dest IPs, then search
+    # between them, using the Administrative Distance as edge weights
+    if algorithm == 'dijkstra':
+        return shortest_path(graph, src_ip, dest_ip)
+
+    # Only load the other searches when one of them is asked for
+    from chapter22 import search
+
+    return search.shortest_path(graph, src_ip, dest_ip, algorithm, landmarks)
 
 
 # ------------------------------
-# DO NOT MODIFY BELOW THIS LINE
+# Command line
 # ------------------------------
 def read_routers(file_name):
-    with open(file_name) as fp:
-        data = fp.read()
+    return routerfile.load_routers(file_name)
 
-    return json.loads(data)
 
+def find_routes(routers, src_dest_pairs, profiler=None, graph=None):
+    profiler = profiler or profiling.Profiler()
 
-def find_routes(routers, src_dest_pairs):
-    for src_ip, dest_ip in src_dest_pairs:
-        path = dijkstras_shortest_path(routers, src_ip, dest_ip)
-        print(f'{src_ip:>15s} -> {dest_ip:<15s}  {repr(path)}')
+    with profiler.stage('compile'):
+        service = RoutingService(graph or CompiledGraph.from_routers(routers))
+
+    # One shortest-path tree per source router, shared by every pair leaving it
+    with profiler.stage('route'):
+        paths = service.routes(src_dest_pairs)
+
+    with profiler.stage('print'):
+        for (src_ip, dest_ip), path in zip(src_dest_pairs, paths):
+            print(f'{src_ip:>15s} -> {dest_ip:<15s}  {repr(path)}')
+
+    profiler.count('routers', len(service.graph))
+    profiler.count('pairs', len(src_dest_pairs))
+    profiler.count('lookups', service.graph.router_table.lookups)
+    profiler.count('trees', service.misses)
+    profiler.update(service.search_stats)
 
 
 def usage():
-    print('usage: dijkstra.py infile.json', file=sys.stderr)
+    print('usage: dijkstra.py [--profile[=FILE]] infile.json', file=sys.stderr)
 
 
-def main(argv):
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    profiler, argv = profiling.from_argv(argv)
+
     try:
         router_file_name = argv[1]
     except:
         usage()
         return 1
 
-    json_data = read_routers(router_file_name)
+    with profiler:
+        # A snapshot's arrays compile straight into a graph, without going
+        # through a routers dict
+        if routerfile.is_snapshot(router_file_name):
+            with profiler.stage('load'):
+                with routerfile.load_snapshot(router_file_name) as snapshot:
+                    graph = CompiledGraph.from_snapshot(snapshot)
+                    routes = snapshot.src_dest()
+            find_routes(None, routes, profiler, graph)
+            return
+
+        with profiler.stage('load'):
+            json_data = read_routers(router_file_name)
 
-    routers = json_data['routers']
-    routes = json_data['src-dest']
+        routers = json_data['routers']
+        routes = json_data['src-dest']
 
-    find_routes(routers, routes)
+        find_routes(routers, routes, profiler)
 
 
 if __name__ == '__main__':
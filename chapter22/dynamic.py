@@ -0,0 +1,228 @@
+"""
+Keeping shortest-path trees up to date while links change.
+
+When a link's 'ad' changes or a link goes down, most of every cached
+shortest-path tree is still correct. Rather than recomputing whole trees,
+the repair functions here only touch the nodes whose distance can actually
+change, in the style of Ramalingam & Reps' dynamic shortest paths:
+
+- A cheaper (or new) edge u -> v can only improve v and whatever is reached
+  through v, so a Dijkstra is restarted from v alone and stops as soon as
+  nothing improves.
+- A more expensive (or removed) edge u -> v only matters if it is in the tree.
+  If so, the subtree hanging below v loses its distances. Each node in it
+  gets a fresh distance from its unaffected in-neighbours, and a Dijkstra
+  limited to that subtree settles the rest.
+"""
+
+import math
+import heapq
+
+from array import array
+from typing import Iterable, Union
+
+from chapter22.graph import NO_NODE, UINT32_TYPECODE, CompiledGraph
+from chapter22.routing import RoutingService
+
+# A link event: ('down', a, b), ('up', a, b, ad) or ('weight', a, b, ad)
+LinkEvent = Union[tuple[str, str, str], tuple[str, str, str, float]]
+
+
+class DynamicGraph(CompiledGraph):
+    """
+    A CompiledGraph whose edge weights can change.
+
+    Removed edges stay in the CSR arrays with an infinite weight, so a link
+    that flaps down and up again is two O(1) weight changes. Only an edge
+    that was never in the graph forces the arrays to be rebuilt.
+
+    It also keeps reverse (incoming) adjacency, which tree repair needs.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        n = len(self)
+        self.edge_slot: dict[tuple[int, int], int] = {}
+        in_degree = [0] * (n + 1)
+        for u in range(n):
+            for edge in self.neighbours(u):
+                self.edge_slot[(u, self.targets[edge])] = edge
+                in_degree[self.targets[edge] + 1] += 1
+
+        # Reverse CSR: the edges arriving at v are in_edges[in_offsets[v]:in_offsets[v + 1]]
+        for v in range(n):
+            in_degree[v + 1] += in_degree[v]
+        self.in_offsets = array(UINT32_TYPECODE, in_degree)
+        self.in_edges = array(UINT32_TYPECODE, [0]) * len(self.targets)
+        self.in_sources = array(UINT32_TYPECODE, [0]) * len(self.targets)
+        fill = list(in_degree[:n])
+        for (u, v), edge in self.edge_slot.items():
+            self.in_edges[fill[v]] = edge
+            self.in_sources[fill[v]] = u
+            fill[v] += 1
+
+    def incoming(self, node: int) -> Iterable[tuple[int, int]]:
+        """`(source node, edge slot)` for every edge arriving at `node`."""
+        for i in range(self.in_offsets[node], self.in_offsets[node + 1]):
+            yield self.in_sources[i], self.in_edges[i]
+
+    def set_edge(self, u: int, v: int, weight: float) -> tuple[float, float]:
+        """
+        Set the weight of edge u -> v (math.inf removes it), adding the edge
+        if it doesn't exist. Returns the `(old, new)` weights.
+        """
+
+        edge = self.edge_slot.get((u, v))
+        if edge is None and weight == math.inf:
+            return math.inf, math.inf
+
+        # The reversed graph copied the old weights; build it again when next asked
+        self._reversed = None
+        if edge is not None:
+            old = self.weights[edge]
+            self.weights[edge] = weight
+            return old, weight
+
+        # A brand new edge: splice it into u's slice of the CSR arrays
+        at = self.offsets[u + 1]
+        self.targets.insert(at, v)
+        self.weights.insert(at, weight)
+        for node in range(u + 1, len(self.offsets)):
+            self.offsets[node] += 1
+        self._build_indexes()
+        return math.inf, weight
+
+
+## -------------------------------------------
+## Tree repair
+## -------------------------------------------
+#
+# These work in place on the (dist, prev) lists of a full shortest-path tree,
+# as returned by graph.dijkstra() without a target.
+
+
+def _propagate(
+    graph: CompiledGraph, dist: list[float], prev: list[int], heap: list
+) -> None:
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+    heapq.heapify(heap)
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue  # stale entry
+        for edge in range(offsets[u], offsets[u + 1]):
+            v = targets[edge]
+            alt = d + weights[edge]
+            if alt < dist[v]:
+                dist[v] = alt
+                prev[v] = u
+                heapq.heappush(heap, (alt, v))
+
+
+def repair_decrease(
+    graph: DynamicGraph, dist: list[float], prev: list[int], u: int, v: int
+) -> None:
+    """Repair a tree after edge u -> v got cheaper or was added."""
+
+    alt = dist[u] + graph.weights[graph.edge_slot[(u, v)]]
+    if alt < dist[v]:
+        dist[v] = alt
+        prev[v] = u
+        _propagate(graph, dist, prev, [(alt, v)])
+
+
+def repair_increase(
+    graph: DynamicGraph, dist: list[float], prev: list[int], u: int, v: int
+) -> None:
+    """Repair a tree after edge u -> v got more expensive or was removed."""
+
+    if prev[v] != u:
+        return  # not a tree edge, so no shortest path used it
+
+    # Everything below v in the tree was reached through u -> v
+    affected = [v]
+    for node in affected:
+        for edge in graph.neighbours(node):
+            child = graph.targets[edge]
+            if prev[child] == node:
+                affected.append(child)
+
+    for node in affected:
+        dist[node] = math.inf
+        prev[node] = NO_NODE
+
+    # Reconnect each affected node through its best unaffected in-neighbour...
+    heap = []
+    for node in affected:
+        for source, edge in graph.incoming(node):
+            alt = dist[source] + graph.weights[edge]
+            if alt < dist[node]:
+                dist[node] = alt
+                prev[node] = source
+        if dist[node] < math.inf:
+            heap.append((dist[node], node))
+
+    # ...and let Dijkstra settle the subtree from there
+    _propagate(graph, dist, prev, heap)
+
+
+class DynamicRoutingService(RoutingService):
+    """
+    A RoutingService whose cached trees are repaired, not thrown away, when
+    links change.
+
+    Links are undirected in the router files (each end lists the other under
+    "connections"), so events change both directions unless told otherwise.
+    """
+
+    def __init__(self, graph: DynamicGraph, **kwargs):
+        super().__init__(graph, **kwargs)
+
+    @classmethod
+    def from_routers(cls, routers: dict, **kwargs) -> 'DynamicRoutingService':
+        return cls(DynamicGraph.from_routers(routers), **kwargs)
+
+    def _set_edge(self, u: int, v: int, weight: float) -> None:
+        old, new = self.graph.set_edge(u, v, weight)
+        for dist, prev in self._trees.values():
+            if new < old:
+                repair_decrease(self.graph, dist, prev, u, v)
+            elif new > old:
+                repair_increase(self.graph, dist, prev, u, v)
+
+    def set_link_weight(
+        self, router_a: str, router_b: str, ad: float, both_ways: bool = True
+    ) -> None:
+        a, b = self.graph.index[router_a], self.graph.index[router_b]
+        self._set_edge(a, b, ad)
+        if both_ways:
+            self._set_edge(b, a, ad)
+
+    def link_down(
+        self, router_a: str, router_b: str, both_ways: bool = True
+    ) -> None:
+        self.set_link_weight(router_a, router_b, math.inf, both_ways)
+
+    def link_up(
+        self, router_a: str, router_b: str, ad: float, both_ways: bool = True
+    ) -> None:
+        self.set_link_weight(router_a, router_b, ad, both_ways)
+
+    def apply(self, event: LinkEvent) -> None:
+        kind, router_a, router_b, *ad = event
+        if kind == 'down':
+            self.link_down(router_a, router_b)
+        elif kind in ('up', 'weight'):
+            self.set_link_weight(router_a, router_b, ad[0])
+        else:
+            raise ValueError(f'Unknown link event {kind!r}')
+
+    def replay(self, events: Iterable[LinkEvent]) -> int:
+        count = 0
+        for event in events:
+            self.apply(event)
+            count += 1
+        return count
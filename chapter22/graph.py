@@ -0,0 +1,211 @@
+"""
+A compiled, integer-indexed form of the routers dictionary for path finding.
+
+Router IPs become node IDs 0..n-1 (in the dictionary's order) and the
+connections become CSR adjacency arrays: the edges leaving node `u` are
+`targets[offsets[u]:offsets[u + 1]]`, with their 'ad' in the same slots of
+`weights`. Compile once, then run as many searches against it as you like.
+"""
+
+import math
+import heapq
+
+from array import array
+from typing import Optional
+
+from chapter19 import netfuncs
+from chapter19.assign import RouterTable
+from chapter19.routerfile import Snapshot
+
+UINT32_TYPECODE = netfuncs.UINT32_TYPECODE
+
+# Predecessor of a node with no predecessor (the source, or unreached nodes)
+NO_NODE = -1
+
+
+class CompiledGraph:
+    def __init__(
+        self,
+        router_ips: list[str],
+        offsets: array,
+        targets: array,
+        weights: array,
+        router_table: RouterTable,
+    ):
+        self.router_ips = router_ips
+        self.index: dict[str, int] = {ip: i for i, ip in enumerate(router_ips)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.router_table = router_table
+        self._reversed: Optional['CompiledGraph'] = None
+
+    @classmethod
+    def from_routers(cls, routers: dict[str, dict]) -> 'CompiledGraph':
+        router_ips = list(routers)
+        index = {ip: i for i, ip in enumerate(router_ips)}
+
+        offsets = array(UINT32_TYPECODE, [0])
+        targets = array(UINT32_TYPECODE)
+        weights = array('d')
+        for router_ip in router_ips:
+            for neighbour_ip, connection in routers[router_ip][
+                'connections'
+            ].items():
+                targets.append(index[neighbour_ip])
+                weights.append(connection['ad'])
+            offsets.append(len(targets))
+
+        return cls(router_ips, offsets, targets, weights, RouterTable(routers))
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot) -> 'CompiledGraph':
+        """Build straight from a routerfile snapshot's arrays, skipping JSON."""
+
+        router_ips = netfuncs.values_to_ipv4s(snapshot.router_ips)
+        masks = [netfuncs.SUBNET_MASKS[slash] for slash in snapshot.prefixes]
+        compiled_routers = [
+            netfuncs.Router(ip, value & mask, mask)
+            for ip, value, mask in zip(router_ips, snapshot.router_ips, masks)
+        ]
+        return cls(
+            router_ips,
+            array(UINT32_TYPECODE, snapshot.offsets),
+            array(UINT32_TYPECODE, snapshot.targets),
+            array('d', snapshot.weights),
+            RouterTable(compiled_routers),
+        )
+
+    def __len__(self) -> int:
+        return len(self.router_ips)
+
+    def neighbours(self, node: int) -> range:
+        """The edge slots (indices into `targets`/`weights`) leaving `node`."""
+        return range(self.offsets[node], self.offsets[node + 1])
+
+    def find_router(self, ip: str) -> Optional[int]:
+        """The node ID of the router on the same subnet as `ip`, if any."""
+        router_ip = self.router_table.lookup(ip)
+        return None if router_ip is None else self.index[router_ip]
+
+    def reversed(self) -> 'CompiledGraph':
+        """
+        The same routers with every edge pointing the other way, for
+        searching backwards from a destination. Built on first use and
+        kept, so anything that changes `weights` or `targets` afterwards
+        must reset `_reversed` (as DynamicGraph.set_edge does).
+        """
+
+        if self._reversed is None:
+            n = len(self)
+            incoming: list[list[tuple[int, float]]] = [[] for _ in range(n)]
+            for u in range(n):
+                for edge in self.neighbours(u):
+                    incoming[self.targets[edge]].append((u, self.weights[edge]))
+
+            offsets = array(UINT32_TYPECODE, [0])
+            targets = array(UINT32_TYPECODE)
+            weights = array('d')
+            for edges in incoming:
+                for u, weight in edges:
+                    targets.append(u)
+                    weights.append(weight)
+                offsets.append(len(targets))
+
+            self._reversed = CompiledGraph(
+                self.router_ips, offsets, targets, weights, self.router_table
+            )
+        return self._reversed
+
+
+def dijkstra(
+    graph: CompiledGraph,
+    source: int,
+    target: Optional[int] = None,
+    stats: Optional[dict[str, int]] = None,
+) -> tuple[list[float], list[int]]:
+    """
+    Single-source shortest paths from `source`, using the 'ad' of each
+    connection as its weight.
+
+    The frontier is a binary heap. Rather than finding and updating a node's
+    old heap entry when a shorter distance turns up, a new entry is pushed
+    and stale ones are skipped when they're popped ("lazy deletion").
+
+    If `target` is given the search stops as soon as it is settled, so only
+    the distances of settled nodes are final.
+
+    Returns `(dist, prev)` lists indexed by node ID; `prev[v]` is the node
+    before `v` on its shortest path (NO_NODE for the source and unreached
+    nodes). If a `stats` dict is passed, the number of nodes settled is
+    added to its 'settled' count and the number of edges they relaxed
+    (scanned) to its 'relaxed' count.
+    """
+
+    offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+    dist = [math.inf] * len(graph)
+    prev = [NO_NODE] * len(graph)
+    settled = bytearray(len(graph))
+
+    dist[source] = 0
+    heap = [(0, source)]
+    relaxed = 0
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if settled[u]:
+            continue
+        settled[u] = 1
+        if u == target:
+            break
+
+        relaxed += offsets[u + 1] - offsets[u]
+        for edge in range(offsets[u], offsets[u + 1]):
+            v = targets[edge]
+            alt = d + weights[edge]
+            if alt < dist[v]:
+                dist[v] = alt
+                prev[v] = u
+                heapq.heappush(heap, (alt, v))
+
+    if stats is not None:
+        stats['settled'] = stats.get('settled', 0) + settled.count(1)
+        stats['relaxed'] = stats.get('relaxed', 0) + relaxed
+    return dist, prev
+
+
+def walk_path(prev: list[int], source: int, target: int) -> Optional[list[int]]:
+    """
+    Follow predecessors back from `target` to `source`, returning the node
+    IDs from `source` to `target` inclusive, or None if `target` was never
+    reached.
+    """
+
+    path = [target]
+    while path[-1] != source:
+        before = prev[path[-1]]
+        if before == NO_NODE:
+            return None
+        path.append(before)
+    path.reverse()
+    return path
+
+
+def shortest_path(graph: CompiledGraph, src_ip: str, dest_ip: str) -> list[str]:
+    """
+    The router IPs along the shortest path between the routers serving
+    `src_ip` and `dest_ip`, both ends included. Empty if they share a router
+    or there is no route between them.
+    """
+
+    start_router = graph.find_router(src_ip)
+    end_router = graph.find_router(dest_ip)
+    if start_router == end_router or start_router is None or end_router is None:
+        return []
+
+    _, prev = dijkstra(graph, start_router, end_router)
+    path = walk_path(prev, start_router, end_router)
+    if path is None:
+        return []
+    return [graph.router_ips[node] for node in path]
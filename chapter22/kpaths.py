@@ -0,0 +1,222 @@
+"""
+More than one path between two routers, for spreading traffic over them.
+
+- equal_cost_paths(): every path whose total 'ad' ties for the minimum
+  (what ECMP routing balances across).
+- k_shortest_paths(): Yen's algorithm for the K shortest loopless paths, in
+  order of total 'ad'.
+
+Both start with one backward Dijkstra from the destination, giving every
+router's distance to it. ECMP walks the edges that are "tight" against those
+distances. Yen reuses them as an exact A* heuristic for each spur search.
+Removing edges and routers can only make paths longer, so the heuristic stays
+admissible, and each spur search heads almost straight for the target rather
+than re-exploring the graph. K paths cost far less than K full searches.
+"""
+
+import math
+import heapq
+
+from typing import Optional
+
+from chapter22.graph import CompiledGraph, dijkstra
+
+
+def distances_to(graph: CompiledGraph, target: int) -> list[float]:
+    """Every router's shortest distance to `target`."""
+    dist, _ = dijkstra(graph.reversed(), target)
+    return dist
+
+
+def _edge(graph: CompiledGraph, u: int, v: int) -> int:
+    for edge in graph.neighbours(u):
+        if graph.targets[edge] == v:
+            return edge
+    raise KeyError(f'No edge from node {u} to node {v}')
+
+
+def path_cost(graph: CompiledGraph, path: list[int]) -> float:
+    return sum(
+        graph.weights[_edge(graph, u, v)] for u, v in zip(path, path[1:])
+    )
+
+
+def equal_cost_paths(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    limit: Optional[int] = None,
+    to_target: Optional[list[float]] = None,
+) -> list[list[int]]:
+    """
+    Every minimum-cost path from `source` to `target`, as lists of node IDs.
+
+    An edge u -> v lies on some shortest path exactly when
+    `weight(u, v) + to_target[v] == to_target[u]`, so a depth-first walk
+    over those edges from `source` produces every shortest path and never
+    hits a dead end. The number of equal-cost paths can grow exponentially,
+    so `limit` caps how many are returned.
+    """
+
+    if to_target is None:
+        to_target = distances_to(graph, target)
+    if to_target[source] == math.inf:
+        return []
+
+    paths = []
+    stack = [(source, [source])]
+    while stack and (limit is None or len(paths) < limit):
+        u, path = stack.pop()
+        if u == target:
+            paths.append(path)
+            continue
+        # Reversed, so that the popping order follows the adjacency order
+        for edge in reversed(graph.neighbours(u)):
+            v = graph.targets[edge]
+            tight = graph.weights[edge] + to_target[v] == to_target[u]
+            # (a zero-'ad' loop could be tight all the way round)
+            if tight and v not in path:
+                stack.append((v, path + [v]))
+    return paths
+
+
+def _spur_search(
+    graph: CompiledGraph,
+    spur: int,
+    target: int,
+    to_target: list[float],
+    banned_nodes: set[int],
+    banned_edges: set[int],
+) -> Optional[tuple[float, list[int]]]:
+    """A* from `spur` to `target` avoiding some nodes and edges."""
+
+    dist = {spur: 0}
+    prev = {spur: -1}
+    settled = set()
+    heap = [(to_target[spur], 0, spur)]
+
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == target:
+            path = [u]
+            while prev[path[-1]] != -1:
+                path.append(prev[path[-1]])
+            path.reverse()
+            return d, path
+
+        for edge in graph.neighbours(u):
+            v = graph.targets[edge]
+            if v in banned_nodes or edge in banned_edges:
+                continue
+            if to_target[v] == math.inf:
+                continue
+            alt = d + graph.weights[edge]
+            if alt < dist.get(v, math.inf):
+                dist[v] = alt
+                prev[v] = u
+                heapq.heappush(heap, (alt + to_target[v], alt, v))
+    return None
+
+
+def k_shortest_paths(
+    graph: CompiledGraph, source: int, target: int, k: int
+) -> list[tuple[float, list[int]]]:
+    """
+    Up to `k` loopless paths from `source` to `target` as `(cost, path)`,
+    shortest first (Yen's algorithm).
+
+    Each new path is found by branching off the previous one: for every
+    node on it (the "spur"), keep the route up to the spur, forbid the
+    next edge of every already-found path sharing that route, and search
+    from the spur for the rest of the way.
+    """
+
+    to_target = distances_to(graph, target)
+    if k <= 0 or to_target[source] == math.inf:
+        return []
+
+    firsts = equal_cost_paths(
+        graph, source, target, limit=1, to_target=to_target
+    )
+    if not firsts:
+        return []
+    first = firsts[0]
+    found = [(to_target[source], first)]
+    candidates: list[tuple[float, tuple[int, ...]]] = []
+    seen = {tuple(first)}
+
+    while len(found) < k:
+        _, last = found[-1]
+        root_cost = 0
+        for i, spur in enumerate(last[:-1]):
+            root = last[: i + 1]
+
+            banned_edges = {
+                _edge(graph, path[i], path[i + 1])
+                for _, path in found
+                if len(path) > i + 1 and path[: i + 1] == root
+            }
+            # The rest of the route may not loop back through the root
+            banned_nodes = set(root[:-1])
+
+            spur_result = _spur_search(
+                graph, spur, target, to_target, banned_nodes, banned_edges
+            )
+            if spur_result is not None:
+                spur_cost, spur_path = spur_result
+                candidate = tuple(root[:-1] + spur_path)
+                if candidate not in seen:
+                    seen.add(candidate)
+                    heapq.heappush(
+                        candidates, (root_cost + spur_cost, candidate)
+                    )
+
+            root_cost += graph.weights[_edge(graph, spur, last[i + 1])]
+
+        if not candidates:
+            break
+        cost, path = heapq.heappop(candidates)
+        found.append((cost, list(path)))
+
+    return found
+
+
+def _routers(
+    graph: CompiledGraph, src_ip: str, dest_ip: str
+) -> Optional[tuple[int, int]]:
+    start_router = graph.find_router(src_ip)
+    end_router = graph.find_router(dest_ip)
+    if start_router == end_router or start_router is None or end_router is None:
+        return None
+    return start_router, end_router
+
+
+def equal_cost_routes(
+    graph: CompiledGraph, src_ip: str, dest_ip: str, limit: Optional[int] = None
+) -> list[list[str]]:
+    """equal_cost_paths() between the routers serving two IPs, as router IPs."""
+
+    routers = _routers(graph, src_ip, dest_ip)
+    if routers is None:
+        return []
+    return [
+        [graph.router_ips[node] for node in path]
+        for path in equal_cost_paths(graph, *routers, limit=limit)
+    ]
+
+
+def k_shortest_routes(
+    graph: CompiledGraph, src_ip: str, dest_ip: str, k: int
+) -> list[tuple[float, list[str]]]:
+    """k_shortest_paths() between the routers serving two IPs, as router IPs."""
+
+    routers = _routers(graph, src_ip, dest_ip)
+    if routers is None:
+        return []
+    return [
+        (cost, [graph.router_ips[node] for node in path])
+        for cost, path in k_shortest_paths(graph, *routers, k)
+    ]
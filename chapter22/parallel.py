@@ -0,0 +1,232 @@
+"""
+$ python -m chapter22.parallel chapter22/example1.json --processes 4
+
+Routing a large src-dest workload on every core.
+
+The pairs are grouped by source router and the groups are spread across a
+pool of worker processes, each of which runs one single-source Dijkstra per
+source it is given. The compiled graph's CSR arrays are copied once into a
+`multiprocessing.shared_memory` block that every worker maps, so tasks only
+carry node IDs in and node paths out. Paths are handed back in the same
+order as the pairs, as soon as every earlier pair has been answered.
+"""
+
+import os
+import sys
+import argparse
+
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
+
+from chapter19 import netfuncs
+from chapter19.assign import NO_ROUTER
+from chapter22.graph import UINT32_TYPECODE, CompiledGraph, dijkstra, walk_path
+
+# multiprocessing is only imported once there's work to spread out
+if TYPE_CHECKING:
+    from multiprocessing import shared_memory
+
+# How many source routers each task covers
+SOURCES_PER_TASK = 16
+
+# (shared memory name, router count, edge count): all a worker needs to map the graph
+SharedGraphSpec = tuple[str, int, int]
+
+
+class SharedGraph:
+    """
+    A CompiledGraph's arrays copied into one shared memory block:
+
+        weights  float64 [edge_count]   (first, so it is 8-byte aligned)
+        offsets  uint32  [router_count + 1]
+        targets  uint32  [edge_count]
+
+    Use it as a context manager; the block is unlinked on exit.
+    """
+
+    def __init__(self, graph: CompiledGraph):
+        from multiprocessing import shared_memory
+
+        n, m = len(graph), len(graph.targets)
+        self.shm = shared_memory.SharedMemory(
+            create=True, size=max(1, _block_size(n, m))
+        )
+        self.spec: SharedGraphSpec = (self.shm.name, n, m)
+
+        arrays = (graph.weights, graph.offsets, graph.targets)
+        for start, values in zip(_array_starts(n, m), arrays):
+            data = memoryview(values).cast('B')
+            self.shm.buf[start : start + len(data)] = data
+
+    def close(self) -> None:
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self) -> 'SharedGraph':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _array_starts(n: int, m: int) -> tuple[int, int, int]:
+    return 0, 8 * m, 8 * m + 4 * (n + 1)
+
+
+def _block_size(n: int, m: int) -> int:
+    return 8 * m + 4 * (n + 1) + 4 * m
+
+
+class GraphView:
+    """
+    The read-only parts of a CompiledGraph that dijkstra() needs, as
+    memoryviews onto a SharedGraph's block.
+    """
+
+    def __init__(self, shm: 'shared_memory.SharedMemory', n: int, m: int):
+        weights_start, offsets_start, targets_start = _array_starts(n, m)
+        buf = shm.buf
+        self.weights = buf[weights_start:offsets_start].cast('d')
+        self.offsets = buf[offsets_start:targets_start].cast(UINT32_TYPECODE)
+        self.targets = buf[targets_start : _block_size(n, m)].cast(
+            UINT32_TYPECODE
+        )
+        self._len = n
+
+    def __len__(self) -> int:
+        return self._len
+
+
+## -------------------------------------------
+## Worker processes
+## -------------------------------------------
+
+_worker_shm: Optional['shared_memory.SharedMemory'] = None
+_worker_graph: Optional[GraphView] = None
+
+
+def _init_worker(spec: SharedGraphSpec) -> None:
+    global _worker_shm, _worker_graph
+    from multiprocessing import shared_memory
+
+    name, n, m = spec
+    # The parent owns (and unlinks) the block; workers only map it
+    _worker_shm = shared_memory.SharedMemory(name=name, track=False)
+    _worker_graph = GraphView(_worker_shm, n, m)
+
+
+def _route_sources(
+    task: list[tuple[int, list[tuple[int, int]]]],
+) -> list[tuple[int, Optional[list[int]]]]:
+    """
+    `task` is a list of `(source, [(pair index, target), ...])`. Returns
+    `(pair index, node path)` for every pair.
+    """
+
+    results = []
+    for source, queries in task:
+        # With only one destination there's no need to grow the whole tree
+        target = queries[0][1] if len(queries) == 1 else None
+        _, prev = dijkstra(_worker_graph, source, target)
+        for pair_index, end in queries:
+            results.append((pair_index, walk_path(prev, source, end)))
+    return results
+
+
+def parallel_routes(
+    graph: CompiledGraph,
+    src_dest_pairs: Iterable[tuple[str, str]],
+    processes: Optional[int] = None,
+    sources_per_task: int = SOURCES_PER_TASK,
+) -> Iterator[list[str]]:
+    """
+    Yield the router path for every src-dest pair, in order, computed
+    across `processes` worker processes (default: one per CPU). Each path is
+    what graph.shortest_path() would return.
+    """
+
+    src_dest_pairs = list(src_dest_pairs)
+    ips = [ip for pair in src_dest_pairs for ip in pair]
+    endpoints = graph.router_table.lookup_values(netfuncs.ipv4s_to_values(ips))
+
+    by_source: dict[int, list[tuple[int, int]]] = {}
+    for pair_index in range(len(src_dest_pairs)):
+        start, end = endpoints[2 * pair_index], endpoints[2 * pair_index + 1]
+        if NO_ROUTER not in (start, end) and start != end:
+            by_source.setdefault(start, []).append((pair_index, end))
+
+    # Dict order puts the source of the earliest pair first, so the in-order
+    # output can start flowing before the whole workload is done
+    groups = list(by_source.items())
+    tasks = [
+        groups[i : i + sources_per_task]
+        for i in range(0, len(groups), sources_per_task)
+    ]
+
+    # Pairs that need a worker at all; the rest (same router, or no router)
+    # are answered with an empty path
+    routed = bytearray(len(src_dest_pairs))
+    for queries in by_source.values():
+        for pair_index, _ in queries:
+            routed[pair_index] = 1
+
+    pending: dict[int, Optional[list[int]]] = {}
+    next_pair = 0
+
+    def flush() -> Iterator[list[str]]:
+        nonlocal next_pair
+        while next_pair < len(src_dest_pairs):
+            path = None
+            if routed[next_pair]:
+                if next_pair not in pending:
+                    return
+                path = pending.pop(next_pair)
+            yield (
+                []
+                if path is None
+                else [graph.router_ips[node] for node in path]
+            )
+            next_pair += 1
+
+    if not tasks:
+        yield from flush()
+        return
+
+    import multiprocessing
+
+    with (
+        SharedGraph(graph) as shared,
+        multiprocessing.Pool(
+            processes or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(shared.spec,),
+        ) as pool,
+    ):
+        for results in pool.imap_unordered(_route_sources, tasks):
+            pending.update(results)
+            yield from flush()
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Route every src-dest pair across several processes.'
+    )
+    parser.add_argument('router_file_name')
+    parser.add_argument('--processes', '-j', type=int, default=None)
+    args = parser.parse_args(argv[1:])
+
+    from chapter22.dijkstra import read_routers
+
+    json_data = read_routers(args.router_file_name)
+    graph = CompiledGraph.from_routers(json_data['routers'])
+    src_dest_pairs = json_data['src-dest']
+
+    for (src_ip, dest_ip), path in zip(
+        src_dest_pairs, parallel_routes(graph, src_dest_pairs, args.processes)
+    ):
+        print(f'{src_ip:>15s} -> {dest_ip:<15s}  {repr(path)}')
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,134 @@
+"""
+$ python -m chapter22.routeclient --port 4042 'ROUTE 10.34.46.25 10.34.52.158'
+$ python -m chapter22.routeclient --unix /tmp/routes.sock --pairs chapter22/example1.json
+
+Talks to chapter22.routeserver. Requests given on the command line are sent
+as one pipelined batch; with --pairs, a ROUTE is sent for every src-dest pair
+in a router file and the answers are printed like chapter22.dijkstra's.
+"""
+
+import sys
+import time
+import socket
+import argparse
+
+from typing import Iterable, Optional
+
+from chapter19 import routerfile
+from chapter22.routeserver import (
+    DEFAULT_PORT,
+    RECV_BUFFER_SIZE,
+    encode_message,
+    take_messages,
+)
+
+# Most requests in flight at once. The server stops reading from a client
+# that lets too many responses pile up, so a client that sent everything
+# before reading anything could deadlock with it on a big batch.
+PIPELINE_DEPTH = 1000
+
+
+class RouteClient:
+    """A connection to a route server. Use it as a context manager."""
+
+    def __init__(
+        self,
+        host: str = 'localhost',
+        port: int = DEFAULT_PORT,
+        unix_path: Optional[str] = None,
+    ):
+        if unix_path:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(unix_path)
+        else:
+            self.socket = socket.create_connection((host, port))
+            # Small requests shouldn't sit waiting for Nagle's algorithm
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._buffer = bytearray()
+
+    def query_many(self, requests: Iterable[str]) -> list[str]:
+        """
+        Send the requests without waiting, PIPELINE_DEPTH at a time, and
+        collect the responses, which come back in the same order.
+        """
+
+        requests = list(requests)
+        responses: list[str] = []
+        for start in range(0, len(requests), PIPELINE_DEPTH):
+            batch = requests[start : start + PIPELINE_DEPTH]
+            self.socket.sendall(b''.join(map(encode_message, batch)))
+
+            expected = len(responses) + len(batch)
+            responses += take_messages(self._buffer)
+            while len(responses) < expected:
+                chunk = self.socket.recv(RECV_BUFFER_SIZE)
+                if not chunk:
+                    raise ConnectionError('Route server hung up')
+                self._buffer += chunk
+                responses += take_messages(self._buffer)
+        return responses
+
+    def query(self, request: str) -> str:
+        return self.query_many([request])[0]
+
+    def route(self, src_ip: str, dest_ip: str) -> list[str]:
+        return self.query(f'ROUTE {src_ip} {dest_ip}').split()
+
+    def routes(
+        self, src_dest_pairs: Iterable[tuple[str, str]]
+    ) -> list[list[str]]:
+        requests = [
+            f'ROUTE {src_ip} {dest_ip}' for src_ip, dest_ip in src_dest_pairs
+        ]
+        return [response.split() for response in self.query_many(requests)]
+
+    def close(self) -> None:
+        self.socket.close()
+
+    def __enter__(self) -> 'RouteClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    parser = argparse.ArgumentParser(description='Query a route server.')
+    parser.add_argument('requests', nargs='*', help="e.g. 'ROUTER 10.34.46.25'")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        '--unix', metavar='PATH', help='connect to a Unix socket instead'
+    )
+    parser.add_argument(
+        '--pairs', metavar='ROUTER_FILE', help='route its src-dest pairs'
+    )
+    args = parser.parse_args(argv[1:])
+
+    with RouteClient(args.host, args.port, args.unix) as client:
+        start = time.perf_counter()
+        if args.pairs:
+            src_dest_pairs = list(routerfile.iter_src_dest(args.pairs))
+            for (src_ip, dest_ip), path in zip(
+                src_dest_pairs, client.routes(src_dest_pairs)
+            ):
+                print(f'{src_ip:>15s} -> {dest_ip:<15s}  {repr(path)}')
+            count = len(src_dest_pairs)
+        else:
+            for response in client.query_many(args.requests):
+                print(response)
+            count = len(args.requests)
+        elapsed = time.perf_counter() - start
+
+    if count:
+        print(
+            f'{count} queries in {elapsed * 1000:.2f} ms'
+            f' ({elapsed / count * 1e6:.1f} us each)',
+            file=sys.stderr,
+        )
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
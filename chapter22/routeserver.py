@@ -0,0 +1,318 @@
+"""
+$ python -m chapter22.routeserver chapter22/example1.json --port 4042
+$ python -m chapter22.routeserver chapter22/example1.json --unix /tmp/routes.sock
+
+A long-running route query server. The topology is loaded and compiled once
+and the RoutingService's shortest-path trees stay warm between queries, so
+answering one costs a tree walk instead of a process start-up, a JSON parse
+and a Dijkstra. The router file is watched and reloaded when it changes.
+
+Protocol: like chapter13's word protocol, every message is a length-prefixed
+UTF-8 string, but with a 4-byte big-endian length so long paths fit.
+Requests are one command per message:
+
+    ROUTE <src ip> <dest ip>  -> router IPs along the path, space separated
+    ROUTER <ip>               -> the router on the same subnet as <ip>
+    PING                      -> PONG
+    RELOAD                    -> OK, after re-reading the router file
+
+A response is empty when there is no route (or no router), and starts with
+"ERR " if the request was malformed. Clients may pipeline: send any number
+of requests without waiting, and the responses come back in the same order.
+A client that sends a message longer than MAX_MESSAGE_SIZE is disconnected,
+and one that doesn't read its responses stops being read from until it
+catches up.
+"""
+
+import os
+import sys
+import stat
+import socket
+import logging
+import argparse
+import selectors
+
+from typing import Optional
+
+from chapter19 import routerfile
+from chapter22.graph import CompiledGraph
+from chapter22.routing import RoutingService
+
+DEFAULT_PORT = 4042
+MESSAGE_LENGTH_SIZE = 4
+MESSAGE_ENCODING = 'UTF-8'
+RECV_BUFFER_SIZE = 1 << 16
+
+# Longest message either side will accept, so a bogus length prefix can't
+# make the other end buffer gigabytes
+MAX_MESSAGE_SIZE = 1 << 20
+
+# Stop reading a client's requests while this many response bytes are
+# waiting for it to read
+OUTBOX_HIGH_WATER = 1 << 20
+
+# How often (seconds) to check whether the router file has changed
+RELOAD_INTERVAL = 1.0
+
+logger = logging.getLogger('routeserver')
+
+
+def encode_message(message: str) -> bytes:
+    payload = message.encode(MESSAGE_ENCODING)
+    return len(payload).to_bytes(MESSAGE_LENGTH_SIZE, 'big') + payload
+
+
+def take_messages(buffer: bytearray) -> list[str]:
+    """
+    Remove every complete message from the front of `buffer` and return
+    them decoded. A trailing partial message is left in the buffer for the
+    next recv() to complete.
+
+    Raises ValueError on a message longer than MAX_MESSAGE_SIZE; the
+    connection can't be trusted to be in step after that.
+    """
+
+    messages = []
+    start = 0
+    while len(buffer) - start >= MESSAGE_LENGTH_SIZE:
+        length = int.from_bytes(
+            buffer[start : start + MESSAGE_LENGTH_SIZE], 'big'
+        )
+        if length > MAX_MESSAGE_SIZE:
+            raise ValueError(
+                f'Message of {length} bytes is over {MAX_MESSAGE_SIZE}'
+            )
+        end = start + MESSAGE_LENGTH_SIZE + length
+        if len(buffer) < end:
+            break
+        messages.append(
+            buffer[start + MESSAGE_LENGTH_SIZE : end].decode(
+                MESSAGE_ENCODING, 'replace'
+            )
+        )
+        start = end
+    del buffer[:start]
+    return messages
+
+
+class RouteServer:
+    """
+    A bad edit to the router file doesn't take the server down; it carries
+    on with the topology it had:
+
+    >>> import json, os, tempfile
+    >>> with open('chapter22/example1.json') as f:
+    ...     topology = json.load(f)
+    >>> fd, name = tempfile.mkstemp(suffix='.json')
+    >>> with os.fdopen(fd, 'w') as f:
+    ...     json.dump(topology, f)
+    >>> server = RouteServer(name)
+    >>> before = server.handle('ROUTE 10.34.98.1 10.34.52.1')
+    >>> before
+    '10.34.98.1 10.34.166.1 10.34.250.1 10.34.52.1'
+    >>> router = topology['routers']['10.34.98.1']
+    >>> router['connections']['10.99.99.1'] = {'netmask': '/24', 'interface': 'en9', 'ad': 1}
+    >>> with open(name, 'w') as f:
+    ...     json.dump(topology, f)
+    >>> os.utime(name, ns=(0, 0))
+    >>> server.reload_if_changed()
+    >>> server.handle('RELOAD')
+    "ERR reload failed: KeyError('10.99.99.1')"
+    >>> server.handle('ROUTE 10.34.98.1 10.34.52.1') == before
+    True
+    >>> os.unlink(name)
+    """
+
+    def __init__(
+        self, router_file_name: str, reload_interval: float = RELOAD_INTERVAL
+    ):
+        self.router_file_name = router_file_name
+        self.reload_interval = reload_interval
+        self.service: Optional[RoutingService] = None
+        self._mtime: Optional[int] = None
+        self.load()
+
+    def load(self) -> None:
+        """(Re)build the routing structures from the router file."""
+
+        mtime = os.stat(self.router_file_name).st_mtime_ns
+        if routerfile.is_snapshot(self.router_file_name):
+            with routerfile.load_snapshot(self.router_file_name) as snapshot:
+                graph = CompiledGraph.from_snapshot(snapshot)
+        else:
+            routers = routerfile.load_routers(self.router_file_name)['routers']
+            graph = CompiledGraph.from_routers(routers)
+
+        # Swap in the new service only once it is fully built
+        self.service = RoutingService(graph)
+        self._mtime = mtime
+        logger.info(f'Loaded {len(graph)} routers from {self.router_file_name}')
+
+    def reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.router_file_name).st_mtime_ns
+        except OSError as e:
+            logger.error(f'Reload of {self.router_file_name} failed: {e!r}')
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            self.load()
+        except Exception as e:
+            # Keep serving the old topology until the file is fixed, and
+            # don't try (or log) again until it changes
+            logger.error(f'Reload of {self.router_file_name} failed: {e!r}')
+            self._mtime = mtime
+
+    def handle(self, request: str) -> str:
+        command, *args = request.split() or ['']
+        try:
+            if command == 'ROUTE' and len(args) == 2:
+                return ' '.join(self.service.route(*args))
+            if command == 'ROUTER' and len(args) == 1:
+                router = self.service.graph.find_router(args[0])
+                return (
+                    ''
+                    if router is None
+                    else self.service.graph.router_ips[router]
+                )
+            if command == 'PING' and not args:
+                return 'PONG'
+            if command == 'RELOAD' and not args:
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error(
+                        f'Reload of {self.router_file_name} failed: {e!r}'
+                    )
+                    return f'ERR reload failed: {e!r}'
+                return 'OK'
+        except ValueError as e:
+            return f'ERR {e}'
+        except Exception as e:
+            # One bad request mustn't take the whole server down
+            logger.exception(f'Request {request!r} failed')
+            return f'ERR {e!r}'
+        return f'ERR bad request {request!r}'
+
+    def serve(self, server_socket: socket.socket) -> None:
+        server_socket.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(server_socket, selectors.EVENT_READ)
+
+        # Per client: [bytes received but not yet a whole message, bytes to send]
+        buffers: dict[socket.socket, tuple[bytearray, bytearray]] = {}
+
+        def close(sock: socket.socket) -> None:
+            selector.unregister(sock)
+            del buffers[sock]
+            sock.close()
+
+        try:
+            while True:
+                for key, events in selector.select(
+                    timeout=self.reload_interval
+                ):
+                    sock = key.fileobj
+                    if sock is server_socket:
+                        new_socket, connection_info = server_socket.accept()
+                        new_socket.setblocking(False)
+                        buffers[new_socket] = (bytearray(), bytearray())
+                        selector.register(new_socket, selectors.EVENT_READ)
+                        logger.debug(f'New connection from {connection_info}')
+                        continue
+
+                    inbox, outbox = buffers[sock]
+                    if events & selectors.EVENT_READ:
+                        try:
+                            chunk = sock.recv(RECV_BUFFER_SIZE)
+                        except ConnectionError:
+                            chunk = b''
+                        if not chunk:
+                            close(sock)
+                            continue
+                        inbox += chunk
+                        try:
+                            requests = take_messages(inbox)
+                        except ValueError as e:
+                            logger.warning(f'Dropping client: {e}')
+                            close(sock)
+                            continue
+                        for request in requests:
+                            outbox += encode_message(self.handle(request))
+
+                    if outbox:
+                        try:
+                            sent = sock.send(outbox)
+                        except BlockingIOError:
+                            sent = 0
+                        except ConnectionError:
+                            close(sock)
+                            continue
+                        del outbox[:sent]
+
+                    # Only ask to hear about writability while there's a
+                    # backlog, and stop taking requests while it's a big one
+                    wanted = (
+                        selectors.EVENT_READ
+                        if len(outbox) < OUTBOX_HIGH_WATER
+                        else 0
+                    ) | (selectors.EVENT_WRITE if outbox else 0)
+                    if key.events != wanted:
+                        selector.modify(sock, wanted)
+
+                self.reload_if_changed()
+        finally:
+            for sock in list(buffers):
+                close(sock)
+            selector.close()
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Serve route queries over a socket.'
+    )
+    parser.add_argument('router_file_name')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        '--unix', metavar='PATH', help='listen on a Unix socket instead'
+    )
+    parser.add_argument(
+        '--reload-interval', type=float, default=RELOAD_INTERVAL
+    )
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.INFO)
+
+    server = RouteServer(args.router_file_name, args.reload_interval)
+
+    if args.unix:
+        # Clear away a socket left behind by an earlier run, but nothing else
+        if os.path.lexists(args.unix):
+            if not stat.S_ISSOCK(os.lstat(args.unix).st_mode):
+                parser.error(f'{args.unix} exists and is not a socket')
+            os.unlink(args.unix)
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(args.unix)
+    else:
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        s.bind(('', args.port))
+    s.listen()
+    logger.info(f'Listening on {args.unix or args.port}')
+
+    try:
+        server.serve(s)
+    except KeyboardInterrupt:
+        logger.info('Server shutdown requested')
+    finally:
+        s.close()
+        if args.unix:
+            os.unlink(args.unix)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
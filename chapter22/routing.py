@@ -0,0 +1,149 @@
+"""
+Answering many route queries against one topology.
+
+Running Dijkstra from scratch for every src-dest pair repeats the same work
+whenever pairs share a source router. RoutingService runs one full
+single-source search per source router, keeps the resulting predecessor
+trees in an LRU cache, and answers each query by walking a tree. It can also
+turn the trees into next-hop forwarding tables.
+"""
+
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from chapter22.graph import NO_NODE, CompiledGraph, dijkstra, walk_path
+
+# How many shortest-path trees to keep (each is O(routers) in size)
+TREE_CACHE_SIZE = 256
+
+
+class RoutingService:
+    def __init__(self, graph: CompiledGraph, cache_size: int = TREE_CACHE_SIZE):
+        self.graph = graph
+        self.cache_size = cache_size
+        self._trees: OrderedDict[int, tuple[list[float], list[int]]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        # Nodes settled and edges relaxed by the searches behind the trees
+        self.search_stats: dict[str, int] = {}
+
+    @classmethod
+    def from_routers(cls, routers: dict, **kwargs) -> 'RoutingService':
+        return cls(CompiledGraph.from_routers(routers), **kwargs)
+
+    def tree(self, source: int) -> tuple[list[float], list[int]]:
+        """The full `(dist, prev)` shortest-path tree rooted at node `source`."""
+
+        tree = self._trees.get(source)
+        if tree is not None:
+            self.hits += 1
+            self._trees.move_to_end(source)
+            return tree
+
+        self.misses += 1
+        tree = dijkstra(self.graph, source, stats=self.search_stats)
+        self._trees[source] = tree
+        if len(self._trees) > self.cache_size:
+            self._trees.popitem(last=False)
+        return tree
+
+    def invalidate(self) -> None:
+        """Forget every cached tree, e.g. after the topology has changed."""
+        self._trees.clear()
+
+    def path(self, start_router: int, end_router: int) -> Optional[list[int]]:
+        _, prev = self.tree(start_router)
+        return walk_path(prev, start_router, end_router)
+
+    def route(self, src_ip: str, dest_ip: str) -> list[str]:
+        """Same answer as graph.shortest_path(), from the cached trees."""
+        return self.routes([(src_ip, dest_ip)])[0]
+
+    def routes(
+        self, src_dest_pairs: Iterable[tuple[str, str]]
+    ) -> list[list[str]]:
+        """
+        Route every pair, returning the paths in the order the pairs were
+        given. Pairs are grouped by source router first, so each source's
+        tree is computed (or fetched from the cache) once however many
+        pairs share it, even if it would have been evicted in between.
+        """
+
+        graph = self.graph
+        endpoints = [
+            (graph.find_router(src_ip), graph.find_router(dest_ip))
+            for src_ip, dest_ip in src_dest_pairs
+        ]
+
+        by_source: dict[int, list[int]] = {}
+        for i, (start_router, end_router) in enumerate(endpoints):
+            if (
+                None not in (start_router, end_router)
+                and start_router != end_router
+            ):
+                by_source.setdefault(start_router, []).append(i)
+
+        paths: list[list[str]] = [[] for _ in endpoints]
+        for start_router, pair_indices in by_source.items():
+            _, prev = self.tree(start_router)
+            for i in pair_indices:
+                path = walk_path(prev, start_router, endpoints[i][1])
+                if path is not None:
+                    paths[i] = [graph.router_ips[node] for node in path]
+        return paths
+
+    def next_hops(self, source: int) -> list[int]:
+        """
+        For every node, the neighbour of `source` that the shortest path to
+        it leaves through (NO_NODE for `source` itself and unreachable nodes).
+        """
+
+        _, prev = self.tree(source)
+        next_hop = [NO_NODE] * len(self.graph)
+        resolved = bytearray(len(self.graph))
+        resolved[source] = 1
+
+        for node in range(len(self.graph)):
+            # Walk up the tree until we hit something already resolved, then
+            # fill in everything we passed on the way back down
+            chain = []
+            while not resolved[node] and prev[node] != NO_NODE:
+                chain.append(node)
+                node = prev[node]
+            hop = next_hop[node] if resolved[node] else NO_NODE
+            for child in reversed(chain):
+                if prev[child] == source:
+                    hop = child
+                next_hop[child] = hop
+                resolved[child] = 1
+        return next_hop
+
+    def forwarding_table(self, router_ip: str) -> dict[str, str]:
+        """Destination router IP -> next-hop router IP, for one router."""
+
+        router_ips = self.graph.router_ips
+        source = self.graph.index[router_ip]
+        return {
+            router_ips[dest]: router_ips[hop]
+            for dest, hop in enumerate(self.next_hops(source))
+            if hop != NO_NODE
+        }
+
+    def forwarding_tables(self) -> dict[str, dict[str, str]]:
+        """Precompute the forwarding table of every router."""
+        return {
+            router_ip: self.forwarding_table(router_ip)
+            for router_ip in self.graph.router_ips
+        }
+
+    def cache_stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'currsize': len(self._trees),
+            'maxsize': self.cache_size,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
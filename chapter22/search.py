@@ -0,0 +1,275 @@
+"""
+Point-to-point shortest path searches.
+
+A plain Dijkstra from the source settles every router closer than the
+destination, i.e. a "ball" around the source. For a single src -> dest
+query there are cheaper ways to find the same distance:
+
+- 'bidirectional': grow one ball forwards from the source and one backwards
+  from the destination, and stop once they meet. Two balls of half the
+  radius cover far fewer routers than one of the full radius.
+- 'alt' (A*, Landmarks, Triangle inequality): an A* search whose estimate of
+  the remaining distance comes from precomputed distances to and from a few
+  "landmark" routers. The search is pulled towards the destination instead
+  of spreading evenly.
+
+All of them return the same distance as 'dijkstra'; when there are several
+equally short paths they may pick a different one.
+"""
+
+import math
+import heapq
+import random
+
+from array import array
+from typing import Callable, NamedTuple, Optional
+
+from chapter22.graph import NO_NODE, CompiledGraph, dijkstra, walk_path
+
+ALGORITHMS = ('dijkstra', 'bidirectional', 'alt')
+
+# How many landmarks Landmarks() picks by default
+LANDMARK_COUNT = 8
+
+
+class SearchResult(NamedTuple):
+    path: Optional[
+        list[int]
+    ]  # node IDs from source to target, None if unreachable
+    distance: float
+    settled: int  # how many nodes the search settled
+
+
+def dijkstra_search(
+    graph: CompiledGraph, source: int, target: int
+) -> SearchResult:
+    stats: dict[str, int] = {}
+    dist, prev = dijkstra(graph, source, target, stats)
+    path = walk_path(prev, source, target)
+    return SearchResult(path, dist[target], stats['settled'])
+
+
+def bidirectional_search(
+    graph: CompiledGraph, source: int, target: int
+) -> SearchResult:
+    """
+    Alternate between a forward Dijkstra from `source` and a backward one
+    (over graph.reversed()) from `target`, always advancing the side with
+    the smaller frontier key. `best` is the shortest source -> target
+    distance seen through any edge joining the two searches; once the two
+    frontier keys add up to at least `best`, nothing shorter can turn up.
+    """
+
+    if source == target:
+        return SearchResult([source], 0, 0)
+
+    sides = (graph, graph.reversed())
+    dist = ({source: 0}, {target: 0})
+    prev = ({source: NO_NODE}, {target: NO_NODE})
+    settled = (set(), set())
+    heaps = ([(0, source)], [(0, target)])
+
+    best = math.inf
+    meeting = NO_NODE
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        other = 1 - side
+        d, u = heapq.heappop(heaps[side])
+        if u in settled[side]:
+            continue
+        settled[side].add(u)
+
+        g = sides[side]
+        for edge in range(g.offsets[u], g.offsets[u + 1]):
+            v = g.targets[edge]
+            alt = d + g.weights[edge]
+            if alt < dist[side].get(v, math.inf):
+                dist[side][v] = alt
+                prev[side][v] = u
+                heapq.heappush(heaps[side], (alt, v))
+            # Does this edge join up with the other search?
+            through = alt + dist[other].get(v, math.inf)
+            if through < best:
+                best = through
+                meeting = v
+
+    settled_count = len(settled[0]) + len(settled[1])
+    if meeting == NO_NODE:
+        return SearchResult(None, math.inf, settled_count)
+
+    path = []
+    node = meeting
+    while node != NO_NODE:
+        path.append(node)
+        node = prev[0][node]
+    path.reverse()
+    node = prev[1][meeting]
+    while node != NO_NODE:
+        path.append(node)
+        node = prev[1][node]
+    return SearchResult(path, best, settled_count)
+
+
+class Landmarks:
+    """
+    Distances from and to a handful of landmark routers, for ALT lower
+    bounds. Each landmark costs two full Dijkstras to precompute and two
+    float64 arrays of one entry per router to store.
+
+    Landmarks are picked "farthest first": each new landmark is the router
+    farthest from the ones already chosen, which spreads them around the
+    edge of the topology where they give the tightest bounds.
+    """
+
+    def __init__(
+        self,
+        graph: CompiledGraph,
+        count: int = LANDMARK_COUNT,
+        seed: Optional[int] = None,
+    ):
+        n = len(graph)
+        count = min(count, n)
+        self.nodes: list[int] = []
+        self.from_landmark: list[array] = []
+        self.to_landmark: list[array] = []
+
+        nearest = [math.inf] * n
+        candidate = random.Random(seed).randrange(n) if n else 0
+        for _ in range(count):
+            from_dist, _ = dijkstra(graph, candidate)
+            to_dist, _ = dijkstra(graph.reversed(), candidate)
+            self.nodes.append(candidate)
+            self.from_landmark.append(array('d', from_dist))
+            self.to_landmark.append(array('d', to_dist))
+
+            # Unreachable routers are skipped so they don't all become landmarks
+            nearest = [min(a, b) for a, b in zip(nearest, from_dist)]
+            reachable = [i for i in range(n) if nearest[i] < math.inf]
+            candidate = max(reachable, key=nearest.__getitem__)
+
+    def lower_bound(self, v: int, t: int) -> float:
+        """A distance no longer than the true v -> t shortest path."""
+        return self.heuristic(t)(v)
+
+    def heuristic(self, t: int) -> Callable[[int], float]:
+        """
+        lower_bound() with the target fixed, for calling once per node
+        during a search. The target's own landmark distances are looked up
+        once, up front.
+        """
+
+        terms = [
+            (from_l, from_l[t], to_l, to_l[t])
+            for from_l, to_l in zip(self.from_landmark, self.to_landmark)
+        ]
+
+        def h(v: int) -> float:
+            bound = 0
+            for from_l, from_t, to_l, to_t in terms:
+                # d(L, t) <= d(L, v) + d(v, t)
+                from_v = from_l[v]
+                if from_v != math.inf and from_t - from_v > bound:
+                    bound = from_t - from_v
+                # d(v, L) <= d(v, t) + d(t, L)
+                if to_t != math.inf and to_l[v] - to_t > bound:
+                    bound = to_l[v] - to_t
+            return bound
+
+        return h
+
+
+def alt_search(
+    graph: CompiledGraph, source: int, target: int, landmarks: Landmarks
+) -> SearchResult:
+    """A* from `source` to `target`, guided by landmark lower bounds."""
+
+    dist = {source: 0}
+    prev = {source: NO_NODE}
+    settled = set()
+
+    heuristic = landmarks.heuristic(target)
+    h = heuristic(source)
+    if h == math.inf:
+        return SearchResult(None, math.inf, 0)
+    heap = [(h, 0, source)]
+
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        if u == target:
+            break
+
+        for edge in range(graph.offsets[u], graph.offsets[u + 1]):
+            v = graph.targets[edge]
+            alt = d + graph.weights[edge]
+            if alt < dist.get(v, math.inf):
+                h = heuristic(v)
+                if h == math.inf:
+                    continue  # v provably can't reach the target
+                dist[v] = alt
+                prev[v] = u
+                heapq.heappush(heap, (alt + h, alt, v))
+
+    if target not in settled:
+        return SearchResult(None, math.inf, len(settled))
+
+    path = [target]
+    while prev[path[-1]] != NO_NODE:
+        path.append(prev[path[-1]])
+    path.reverse()
+    return SearchResult(path, dist[target], len(settled))
+
+
+def point_to_point(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    algorithm: str = 'dijkstra',
+    landmarks: Optional[Landmarks] = None,
+) -> SearchResult:
+    """
+    Find the shortest `source` -> `target` path with the named algorithm
+    (one of ALGORITHMS). 'alt' needs `landmarks`; if none are given they are
+    computed on the spot, which costs more than the search itself, so build
+    a Landmarks once and pass it in when making many queries.
+    """
+
+    if algorithm == 'dijkstra':
+        return dijkstra_search(graph, source, target)
+    if algorithm == 'bidirectional':
+        return bidirectional_search(graph, source, target)
+    if algorithm == 'alt':
+        if landmarks is None:
+            landmarks = Landmarks(graph)
+        return alt_search(graph, source, target, landmarks)
+    raise ValueError(
+        f'Unknown algorithm {algorithm!r}, expected one of {ALGORITHMS}'
+    )
+
+
+def shortest_path(
+    graph: CompiledGraph,
+    src_ip: str,
+    dest_ip: str,
+    algorithm: str = 'dijkstra',
+    landmarks: Optional[Landmarks] = None,
+) -> list[str]:
+    """graph.shortest_path(), with a choice of search algorithm."""
+
+    start_router = graph.find_router(src_ip)
+    end_router = graph.find_router(dest_ip)
+    if start_router == end_router or start_router is None or end_router is None:
+        return []
+
+    result = point_to_point(
+        graph, start_router, end_router, algorithm, landmarks
+    )
+    if result.path is None:
+        return []
+    return [graph.router_ips[node] for node in result.path]
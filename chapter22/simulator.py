@@ -0,0 +1,429 @@
+"""
+$ python -m chapter22.simulator chapter22/example1.json
+$ python -m chapter22.simulator isp10k.json --sample 100 --fail 10.0.0.1 10.0.1.1
+
+Everything else in chapter22 computes routes with a global view of the
+topology. This is a discrete-event simulation of how routers would get
+there on their own, by running a routing protocol over the links:
+
+- DistanceVector: distributed Bellman-Ford. Every router keeps the last
+  vector heard from each neighbour, and sends triggered updates with only
+  the routes that changed. It uses split horizon with poisoned reverse: a
+  route learned from a neighbour is advertised back to that neighbour as
+  unreachable.
+- LinkState: every router floods a link-state advertisement (LSA) to the
+  whole network and then runs its own SPF. Only the flooding is simulated;
+  SPF is charged a fixed delay, since its result is what dijkstra()
+  already computes.
+
+Both start cold (each router knows only its links). They report the
+simulated time until the last routing change and how many messages it
+took. Optionally a link can fail once things have settled.
+
+State is kept in flat arrays indexed by router and destination (or origin)
+column, so the cost is O(routers * columns). For 10k-router topologies,
+simulate a random sample of destinations/origins with --sample; each column
+converges independently of the others, so times are representative and the
+number of routes or LSAs carried scales linearly. (DV packets batch several
+routes, so the packet count grows more slowly than that.)
+"""
+
+import sys
+import math
+import heapq
+import random
+import argparse
+import itertools
+
+from array import array
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from chapter19 import routerfile
+from chapter22.graph import NO_NODE, CompiledGraph
+
+# Simulated seconds
+LINK_DELAY = 0.001  # for a message to cross a link
+UPDATE_DELAY = 0.005  # a DV router batches changes this long before sending
+SPF_DELAY = 0.010  # for a link-state router to rerun SPF
+
+
+class EventQueue:
+    """A clock and a heap of `(time, seq, handler, args)` waiting to run."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.processed = 0
+        self._heap: list[tuple[float, int, Callable, tuple]] = []
+        # Ties in time run in the order they were scheduled
+        self._seq = itertools.count()
+
+    def schedule(self, delay: float, handler: Callable, *args) -> None:
+        heapq.heappush(
+            self._heap, (self.now + delay, next(self._seq), handler, args)
+        )
+
+    def run(self, until: float = math.inf) -> None:
+        heap = self._heap
+        while heap and heap[0][0] <= until:
+            self.now, _, handler, args = heapq.heappop(heap)
+            self.processed += 1
+            handler(*args)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class SimulationStats(NamedTuple):
+    protocol: str
+    converged_at: float  # simulated time of the last routing change
+    messages: int  # packets sent across links
+    entries: int  # routes (DV) or LSAs (LS) carried by those packets
+    events: int  # events the simulator processed
+
+
+def _reverse_edges(graph: CompiledGraph) -> array:
+    """For every edge u -> v, the index of the edge v -> u (or NO_NODE)."""
+
+    edge_index = {}
+    for u in range(len(graph)):
+        for edge in range(graph.offsets[u], graph.offsets[u + 1]):
+            edge_index[u, graph.targets[edge]] = edge
+
+    reverse = array('l', [NO_NODE]) * len(graph.targets)
+    for (u, v), edge in edge_index.items():
+        reverse[edge] = edge_index.get((v, u), NO_NODE)
+    return reverse
+
+
+class Protocol:
+    """What the two protocols share: the links, the clock and the counters."""
+
+    name = ''
+
+    def __init__(self, graph: CompiledGraph, link_delay: float = LINK_DELAY):
+        self.graph = graph
+        # A copy, so that failing links doesn't touch the caller's graph
+        self.weights = array('d', graph.weights)
+        self.reverse_edge = _reverse_edges(graph)
+        self.link_delay = link_delay
+        self.events = EventQueue()
+        self.messages = 0
+        self.entries = 0
+        self.last_change = 0.0
+
+    def link_down(self, a_ip: str, b_ip: str, delay: float = 0.0) -> None:
+        """Fail the link between two routers (both directions) after `delay`."""
+
+        u, v = self.graph.index[a_ip], self.graph.index[b_ip]
+        for edge in range(self.graph.offsets[u], self.graph.offsets[u + 1]):
+            if self.graph.targets[edge] == v:
+                self.events.schedule(delay, self._link_down, u, edge)
+                return
+        raise KeyError(f'No link from {a_ip} to {b_ip}')
+
+    def _link_down(self, u: int, edge: int) -> None:
+        """Fail `edge`, which leaves router `u`, and its reverse."""
+        self.weights[edge] = math.inf
+        if self.reverse_edge[edge] != NO_NODE:
+            self.weights[self.reverse_edge[edge]] = math.inf
+
+    def run(self, until: float = math.inf) -> SimulationStats:
+        self.events.run(until)
+        return self.stats()
+
+    def stats(self) -> SimulationStats:
+        return SimulationStats(
+            self.name,
+            self.last_change,
+            self.messages,
+            self.entries,
+            self.events.processed,
+        )
+
+
+class DistanceVector(Protocol):
+    """
+    Distance-vector routing towards `destinations` (node IDs, default all).
+
+    `heard[edge * K + k]` is the distance to destination column k that the
+    far end of `edge` last advertised, and a router's own `dist`/`next_hop`
+    entries are the best of `weight + heard` over its edges. Routes of
+    `infinity` or more count as unreachable, which is what ends a
+    count-to-infinity after a failure. By default it is one more than the
+    longest any loopless path could possibly be: the smaller of the sum of
+    all link weights and (routers - 1) times the heaviest one.
+    """
+
+    name = 'distance-vector'
+
+    def __init__(
+        self,
+        graph: CompiledGraph,
+        destinations: Optional[Iterable[int]] = None,
+        link_delay: float = LINK_DELAY,
+        update_delay: float = UPDATE_DELAY,
+        infinity: Optional[float] = None,
+    ):
+        super().__init__(graph, link_delay)
+        n = len(graph)
+        self.destinations = list(
+            range(n) if destinations is None else destinations
+        )
+        self.update_delay = update_delay
+        if infinity is None:
+            finite = [w for w in self.weights if w != math.inf]
+            infinity = min(sum(finite), (n - 1) * max(finite, default=0)) + 1
+        self.infinity = infinity
+
+        k = len(self.destinations)
+        self.dist = array('d', [math.inf]) * (n * k)
+        self.next_hop = array('l', [NO_NODE]) * (n * k)
+        self.heard = array('d', [math.inf]) * (len(graph.targets) * k)
+        # Router -> destination columns changed since its last update
+        self.pending: dict[int, set[int]] = {}
+
+        for column, d in enumerate(self.destinations):
+            self._set_route(d, column, 0, d)
+
+    def _set_route(
+        self, v: int, column: int, distance: float, hop: int
+    ) -> None:
+        slot = v * len(self.destinations) + column
+        self.dist[slot] = distance
+        self.next_hop[slot] = hop
+        self.last_change = self.events.now
+        if v not in self.pending:
+            self.pending[v] = set()
+            self.events.schedule(self.update_delay, self._send_update, v)
+        self.pending[v].add(column)
+
+    def _send_update(self, u: int) -> None:
+        columns = sorted(self.pending.pop(u))
+        base = u * len(self.destinations)
+        routes = [(column, self.dist[base + column]) for column in columns]
+
+        # Which columns each neighbour hears as poisoned
+        poisoned: dict[int, set[int]] = {}
+        for column in columns:
+            poisoned.setdefault(self.next_hop[base + column], set()).add(column)
+
+        graph = self.graph
+        for edge in range(graph.offsets[u], graph.offsets[u + 1]):
+            if self.weights[edge] == math.inf:
+                continue
+            v = graph.targets[edge]
+            self.messages += 1
+            self.entries += len(routes)
+            self.events.schedule(
+                self.link_delay,
+                self._receive,
+                v,
+                edge,
+                routes,
+                poisoned.get(v, ()),
+            )
+
+    def _receive(
+        self,
+        v: int,
+        edge: int,
+        routes: list[tuple[int, float]],
+        poisoned: set[int],
+    ) -> None:
+        back = self.reverse_edge[edge]
+        if back == NO_NODE or self.weights[back] == math.inf:
+            return  # lost on a failed link, or v has no way back to use it
+
+        u = self.graph.targets[back]
+        k = len(self.destinations)
+        for column, distance in routes:
+            if column in poisoned:
+                distance = math.inf
+            self.heard[back * k + column] = distance
+            if v == self.destinations[column]:
+                continue
+
+            slot = v * k + column
+            via_u = self._cap(self.weights[back] + distance)
+            if via_u < self.dist[slot]:
+                self._set_route(v, column, via_u, u)
+            elif self.next_hop[slot] == u and via_u != self.dist[slot]:
+                # The route we were using got worse; maybe another is better now
+                self._reselect(v, column)
+
+    def _cap(self, distance: float) -> float:
+        if distance >= self.infinity:
+            return math.inf
+        return distance
+
+    def _reselect(self, v: int, column: int) -> None:
+        k = len(self.destinations)
+        best, hop = math.inf, NO_NODE
+        for edge in range(self.graph.offsets[v], self.graph.offsets[v + 1]):
+            distance = self._cap(
+                self.weights[edge] + self.heard[edge * k + column]
+            )
+            if distance < best:
+                best, hop = distance, self.graph.targets[edge]
+        slot = v * k + column
+        if best != self.dist[slot] or hop != self.next_hop[slot]:
+            self._set_route(v, column, best, hop)
+
+    def _link_down(self, u: int, edge: int) -> None:
+        super()._link_down(u, edge)
+
+        # Both ends lose whatever they were routing over the link
+        k = len(self.destinations)
+        v = self.graph.targets[edge]
+        for here, there in ((u, v), (v, u)):
+            for column, d in enumerate(self.destinations):
+                if here != d and self.next_hop[here * k + column] == there:
+                    self._reselect(here, column)
+
+
+class LinkState(Protocol):
+    """
+    Link-state flooding of LSAs from `origins` (node IDs, default all).
+
+    Each router forwards an LSA newer than the one it holds to every
+    neighbour except the one it came from, and drops older or duplicate
+    copies. `seen[origin][v]` is the newest sequence number router v holds
+    for `origin`.
+    """
+
+    name = 'link-state'
+
+    def __init__(
+        self,
+        graph: CompiledGraph,
+        origins: Optional[Iterable[int]] = None,
+        link_delay: float = LINK_DELAY,
+        spf_delay: float = SPF_DELAY,
+    ):
+        super().__init__(graph, link_delay)
+        self.spf_delay = spf_delay
+        self.sequence = array('L', [0]) * len(graph)
+        self.seen: dict[int, array] = {}
+        self.duplicates = 0
+
+        for origin in range(len(graph)) if origins is None else origins:
+            self._originate(origin)
+
+    def _originate(self, origin: int) -> None:
+        self.sequence[origin] += 1
+        if origin not in self.seen:
+            self.seen[origin] = array('L', [0]) * len(self.graph)
+        self._install(origin, origin, self.sequence[origin], NO_NODE)
+
+    def _install(self, v: int, origin: int, sequence: int, sender: int) -> None:
+        self.seen[origin][v] = sequence
+        # Routes change once SPF has run over the new LSA
+        self.last_change = self.events.now + self.spf_delay
+
+        graph = self.graph
+        for edge in range(graph.offsets[v], graph.offsets[v + 1]):
+            w = graph.targets[edge]
+            if w != sender and self.weights[edge] != math.inf:
+                self.messages += 1
+                self.entries += 1
+                self.events.schedule(
+                    self.link_delay, self._receive, w, v, edge, origin, sequence
+                )
+
+    def _receive(
+        self, v: int, sender: int, edge: int, origin: int, sequence: int
+    ) -> None:
+        if self.weights[edge] == math.inf:
+            return  # lost on a failed link
+        if sequence <= self.seen[origin][v]:
+            self.duplicates += 1
+            return
+        self._install(v, origin, sequence, sender)
+
+    def _link_down(self, u: int, edge: int) -> None:
+        super()._link_down(u, edge)
+        # Both ends advertise their changed links
+        self._originate(u)
+        self._originate(self.graph.targets[edge])
+
+
+def print_stats(
+    stats: SimulationStats, scale: float = 1, label: str = ''
+) -> None:
+    """`scale` extrapolates a sampled run's entry count to the whole network."""
+    print(
+        f'{stats.protocol + label:>29s}: converged at {stats.converged_at * 1000:8.1f} ms,'
+        f' {stats.messages:>9d} messages, {stats.entries:>10d} entries,'
+        f' {stats.events:>9d} events'
+        + (
+            f' (~{stats.entries * scale:,.0f} entries unsampled)'
+            if scale != 1
+            else ''
+        )
+    )
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Simulate distance-vector and link-state routing convergence.'
+    )
+    parser.add_argument('router_file_name')
+    parser.add_argument(
+        '--protocol', choices=('dv', 'ls', 'both'), default='both'
+    )
+    parser.add_argument(
+        '--sample',
+        type=int,
+        default=0,
+        help='simulate only this many random destinations/origins',
+    )
+    parser.add_argument(
+        '--fail', nargs=2, metavar=('A', 'B'), help='then fail link A-B'
+    )
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv[1:])
+
+    routers = routerfile.load_routers(args.router_file_name)['routers']
+    graph = CompiledGraph.from_routers(routers)
+    n = len(graph)
+
+    columns = None
+    scale = 1
+    if args.sample and args.sample < n:
+        columns = random.Random(args.seed).sample(range(n), args.sample)
+        scale = n / args.sample
+
+    protocols = []
+    if args.protocol in ('dv', 'both'):
+        protocols.append(DistanceVector)
+    if args.protocol in ('ls', 'both'):
+        protocols.append(LinkState)
+
+    for protocol_class in protocols:
+        protocol = protocol_class(graph, columns)
+        before = protocol.run()
+        print_stats(before, scale)
+        if not args.fail:
+            continue
+
+        protocol.link_down(*args.fail)
+        start = protocol.events.now
+        after = protocol.run()
+        print_stats(
+            SimulationStats(
+                after.protocol,
+                max(0.0, after.converged_at - start),
+                after.messages - before.messages,
+                after.entries - before.entries,
+                after.events - before.events,
+            ),
+            # A failure floods only the two ends' LSAs, however many were sampled
+            scale if protocol_class is DistanceVector else 1,
+            ' after failure',
+        )
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,267 @@
+"""
+$ python -m chapter22.topogen --shape isp --routers 10000 --pairs 1000 -o isp10k.json
+
+Synthetic router topologies, written in the same JSON schema as
+example1.json ("routers" with "connections", "netmask" and "ad", plus
+"src-dest" pairs), at whatever size and shape a benchmark needs.
+
+Every router gets its own /24, counting up from 10.0.0.0, and is the .1 of
+it. Links are undirected: both ends list each other, with the same 'ad'.
+
+Shapes:
+- grid:      a square lattice, every router linked to its 4 neighbours
+- random:    a random spanning tree plus random extra links
+- geometric: routers scattered on a unit square, linked to those nearby,
+             with 'ad' growing with distance
+- scalefree: Barabasi-Albert preferential attachment, a few huge hubs
+- isp:       a hierarchical core / aggregation / access network
+"""
+
+import sys
+import json
+import math
+import random
+import argparse
+
+from typing import Callable, Optional
+
+from chapter19 import netfuncs
+
+FIRST_NETWORK = netfuncs.ipv4_to_value('10.0.0.0')
+MAX_AD = 128
+
+
+class Topology:
+    """Routers dictionary under construction."""
+
+    def __init__(self, count: int, rng: random.Random):
+        self.rng = rng
+        self.router_ips = [
+            netfuncs.value_to_ipv4(FIRST_NETWORK + (i << 8) + 1)
+            for i in range(count)
+        ]
+        self.routers = {
+            router_ip: {
+                'connections': {},
+                'netmask': '/24',
+                'if_count': 0,
+                'if_prefix': 'en' if i % 2 == 0 else 'eth',
+            }
+            for i, router_ip in enumerate(self.router_ips)
+        }
+        # Union-find over router indices, to stitch components together
+        self._parent = list(range(count))
+
+    def _find(self, i: int) -> int:
+        while self._parent[i] != i:
+            self._parent[i] = self._parent[self._parent[i]]
+            i = self._parent[i]
+        return i
+
+    def connect(self, a: int, b: int, ad: Optional[int] = None) -> None:
+        if a == b:
+            return
+        ad = self.rng.randint(1, MAX_AD) if ad is None else ad
+        for here, there in ((a, b), (b, a)):
+            router = self.routers[self.router_ips[here]]
+            connections = router['connections']
+            there_ip = self.router_ips[there]
+            if there_ip in connections:
+                return
+            connections[there_ip] = {
+                'netmask': '/24',
+                'interface': f'{router["if_prefix"]}{len(connections)}',
+                'ad': ad,
+            }
+            router['if_count'] = len(connections)
+        self._parent[self._find(a)] = self._find(b)
+
+    def connect_components(self) -> None:
+        """Link every connected component to the one before it."""
+        roots = {}
+        for i in range(len(self.router_ips)):
+            roots.setdefault(self._find(i), i)
+        members = list(roots.values())
+        for a, b in zip(members, members[1:]):
+            self.connect(a, b)
+
+
+## -------------------------------------------
+## Shapes
+## -------------------------------------------
+
+
+def grid(topology: Topology, degree: int) -> None:
+    count = len(topology.router_ips)
+    side = math.ceil(math.sqrt(count))
+    for i in range(count):
+        if (i + 1) % side and i + 1 < count:
+            topology.connect(i, i + 1)
+        if i + side < count:
+            topology.connect(i, i + side)
+
+
+def random_links(topology: Topology, degree: int) -> None:
+    count = len(topology.router_ips)
+    rng = topology.rng
+    for i in range(1, count):
+        topology.connect(i, rng.randrange(i))
+    for _ in range(count * max(0, degree - 2) // 2):
+        topology.connect(rng.randrange(count), rng.randrange(count))
+
+
+def geometric(topology: Topology, degree: int) -> None:
+    count = len(topology.router_ips)
+    rng = topology.rng
+    points = [(rng.random(), rng.random()) for _ in range(count)]
+
+    # A radius that gives roughly `degree` neighbours on average, and a
+    # bucket grid of that cell size so only nearby buckets are compared
+    radius = math.sqrt(degree / (math.pi * max(count, 1)))
+    cells = max(1, int(1 / radius))
+    buckets: dict[tuple[int, int], list[int]] = {}
+    for i, (x, y) in enumerate(points):
+        buckets.setdefault((int(x * cells), int(y * cells)), []).append(i)
+
+    for (cx, cy), members in buckets.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for i in members:
+                    for j in buckets.get((cx + dx, cy + dy), ()):
+                        if i < j:
+                            distance = math.dist(points[i], points[j])
+                            if distance <= radius:
+                                ad = 1 + int((MAX_AD - 1) * distance / radius)
+                                topology.connect(i, j, ad)
+
+    topology.connect_components()
+
+
+def scalefree(topology: Topology, degree: int) -> None:
+    count = len(topology.router_ips)
+    rng = topology.rng
+    links_per_router = max(1, degree // 2)
+
+    # Every link end goes in `ends`, so picking uniformly from it picks
+    # routers in proportion to how connected they already are
+    ends: list[int] = []
+    for i in range(1, min(count, links_per_router + 1)):
+        topology.connect(i, 0)
+        ends += [i, 0]
+    for i in range(links_per_router + 1, count):
+        for j in {rng.choice(ends) for _ in range(links_per_router)}:
+            topology.connect(i, j)
+            ends += [i, j]
+
+
+def isp(topology: Topology, degree: int) -> None:
+    count = len(topology.router_ips)
+    rng = topology.rng
+    core_count = max(2, count // 100)
+    aggregation_count = max(1, count // 10)
+
+    core = range(min(core_count, count))
+    aggregation = range(core.stop, min(core.stop + aggregation_count, count))
+    access = range(aggregation.stop, count)
+
+    # The core is a ring with a few chords; its links are cheap
+    for i in core:
+        topology.connect(i, core[(i + 1) % len(core)], rng.randint(1, 10))
+    for _ in range(len(core)):
+        topology.connect(rng.choice(core), rng.choice(core), rng.randint(5, 20))
+
+    # Aggregation routers are dual-homed to the core
+    for i in aggregation:
+        for j in rng.sample(core, min(2, len(core))):
+            topology.connect(i, j, rng.randint(10, 40))
+
+    # Access routers hang off one or two aggregation routers, or the core
+    uplinks = aggregation or core
+    for i in access:
+        for j in rng.sample(uplinks, min(rng.randint(1, 2), len(uplinks))):
+            topology.connect(i, j, rng.randint(40, MAX_AD))
+
+    topology.connect_components()
+
+
+SHAPES: dict[str, Callable[[Topology, int], None]] = {
+    'grid': grid,
+    'random': random_links,
+    'geometric': geometric,
+    'scalefree': scalefree,
+    'isp': isp,
+}
+
+
+def random_routers(
+    count: int,
+    degree: int = 4,
+    rng: Optional[random.Random] = None,
+    shape: str = 'random',
+) -> dict:
+    """A `count`-router topology of the given shape in the chapter's schema."""
+
+    topology = Topology(count, rng or random.Random())
+    SHAPES[shape](topology, degree)
+    return topology.routers
+
+
+def random_host(router_ip: str, rng: random.Random) -> str:
+    """A host address on the same /24 as `router_ip`."""
+    network = netfuncs.ipv4_to_value(router_ip) & netfuncs.SUBNET_MASKS[24]
+    return netfuncs.value_to_ipv4(network | rng.randint(2, 254))
+
+
+def generate(
+    shape: str,
+    count: int,
+    degree: int = 4,
+    pairs: int = 0,
+    seed: Optional[int] = None,
+) -> dict:
+    """A whole router file: 'routers' plus `pairs` random 'src-dest' pairs."""
+
+    if pairs > 0 and count < 1:
+        raise ValueError(
+            f'Need at least one router for src-dest pairs, got {count}'
+        )
+
+    rng = random.Random(seed)
+    routers = random_routers(count, degree, rng, shape)
+    router_ips = list(routers)
+    src_dest = [
+        [random_host(rng.choice(router_ips), rng) for _ in range(2)]
+        for _ in range(pairs)
+    ]
+    return {'routers': routers, 'src-dest': src_dest}
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic router topology as JSON.'
+    )
+    parser.add_argument('--shape', choices=SHAPES, default='random')
+    parser.add_argument('--routers', type=int, default=1000)
+    parser.add_argument('--degree', type=int, default=4)
+    parser.add_argument('--pairs', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('-o', '--output', default='-')
+    args = parser.parse_args(argv[1:])
+
+    try:
+        json_data = generate(
+            args.shape, args.routers, args.degree, args.pairs, args.seed
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if args.output == '-':
+        json.dump(json_data, sys.stdout, indent=4)
+    else:
+        with open(args.output, 'w') as fp:
+            json.dump(json_data, fp, indent=4)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))